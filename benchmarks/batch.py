@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""Compares the per-haystack cost of the batch matching methods with the
+equivalent scalar loop over many short haystacks.
+
+Usage: python benchmarks/batch.py [count]
+"""
+from __future__ import print_function
+import sys
+import timeit
+
+from rure.lib import Rure, RureSet
+
+
+AGENTS = [
+    b"Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    b"Chrome/77.0.3865.90 Safari/537.36",
+    b"Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:69.0) Gecko/20100101 "
+    b"Firefox/69.0",
+    b"curl/7.58.0",
+    b"Googlebot/2.1 (+http://www.google.com/bot.html)",
+]
+
+
+def bench(label, fn, count, repeat=5):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print("{:<28} {:>10.1f} ns/item".format(label, best / count * 1e9))
+
+
+def main(count):
+    haystacks = [AGENTS[i % len(AGENTS)] for i in range(count)]
+    re = Rure(b"(?i)bot|crawler|spider")
+    res = RureSet(b"Chrome/\\d+", b"Firefox/\\d+", b"(?i)bot", b"curl/")
+
+    print("{} haystacks".format(count))
+    bench("Rure.is_match loop",
+          lambda: [re.is_match(h) for h in haystacks], count)
+    bench("Rure.is_match_many",
+          lambda: re.is_match_many(haystacks), count)
+    bench("Rure.find loop",
+          lambda: [re.find(h) for h in haystacks], count)
+    bench("Rure.find_many",
+          lambda: re.find_many(haystacks), count)
+    bench("RureSet.is_match loop",
+          lambda: [res.is_match(h) for h in haystacks], count)
+    bench("RureSet.is_match_many",
+          lambda: res.is_match_many(haystacks), count)
+    bench("RureSet.matches loop",
+          lambda: [res.matches(h) for h in haystacks], count)
+    bench("RureSet.matches_many",
+          lambda: res.matches_many(haystacks), count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
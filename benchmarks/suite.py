@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+"""Measures what Python code pays to search with rure, on the corpora and
+patterns of the Rust benchmarks in regex/bench, and compares it with the
+re module and, if installed, the third-party regex module.
+
+Engines:
+
+    rure        rure.lib.Rure and RureSet, on byte strings
+    rure.regex  the re compatible rure API, on str
+    re          the standard library, on str
+    regex       the regex module, on str
+
+Each benchmark reports the best time per operation. The fixed cost of a
+call, measured on an empty haystack, and the cost of each match yielded by
+an iterator are measured separately for every engine and method, and are
+subtracted to give the scan throughput of the engine itself.
+
+Usage: python benchmarks/suite.py [--filter REGEX] [--engines NAMES]
+                                  [--min-time SECONDS] [--repeat N]
+                                  [--data DIR] [--json PATH]
+
+regexdna benchmarks are run if the data directory has a regexdna.txt file,
+as generated for the Rust benchmarks.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import timeit
+
+import rure
+from rure.lib import Rure, RureSet
+
+try:
+    import regex
+    # Not the Rust crate in ./regex, found as a namespace package.
+    regex.compile
+except (ImportError, AttributeError):
+    regex = None
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'regex', 'bench', 'src', 'data')
+
+# sherlock.rs: (name, pattern, count of matches)
+SHERLOCK = [
+    ('name_sherlock', u'Sherlock', 97),
+    ('name_holmes', u'Holmes', 461),
+    ('name_sherlock_holmes', u'Sherlock Holmes', 91),
+    ('name_sherlock_nocase', u'(?i)Sherlock', 102),
+    ('name_holmes_nocase', u'(?i)Holmes', 467),
+    ('name_sherlock_holmes_nocase', u'(?i)Sherlock Holmes', 96),
+    ('name_whitespace', u'Sherlock\\s+Holmes', 97),
+    ('name_alt1', u'Sherlock|Street', 158),
+    ('name_alt2', u'Sherlock|Holmes', 558),
+    ('name_alt3', u'Sherlock|Holmes|Watson|Irene|Adler|John|Baker', 740),
+    ('name_alt3_nocase',
+     u'(?i)Sherlock|Holmes|Watson|Irene|Adler|John|Baker', 753),
+    ('name_alt4', u'Sher[a-z]+|Hol[a-z]+', 582),
+    ('name_alt4_nocase', u'(?i)Sher[a-z]+|Hol[a-z]+', 697),
+    ('name_alt5', u'Sherlock|Holmes|Watson', 639),
+    ('name_alt5_nocase', u'(?i)Sherlock|Holmes|Watson', 650),
+    ('no_match_uncommon', u'zqj', 0),
+    ('no_match_common', u'aqj', 0),
+    ('no_match_really_common', u'aei', 0),
+    ('the_lower', u'the', 7218),
+    ('the_upper', u'The', 741),
+    ('the_nocase', u'(?i)the', 7987),
+    ('the_whitespace', u'the\\s+\\w+', 5410),
+    ('everything_greedy', u'.*', 13053),
+    ('everything_greedy_nl', u'(?s).*', 1),
+    ('letters', u'\\p{L}', 447160),
+    ('letters_upper', u'\\p{Lu}', 14180),
+    ('letters_lower', u'\\p{Ll}', 432980),
+    ('words', u'\\w+', 109214),
+    ('before_holmes', u'\\w+\\s+Holmes', 319),
+    ('before_after_holmes', u'\\w+\\s+Holmes\\s+\\w+', 137),
+    ('holmes_cochar_watson',
+     u'Holmes.{0,25}Watson|Watson.{0,25}Holmes', 7),
+    ('holmes_coword_watson',
+     u'Holmes(?:\\s*.+\\s*){0,10}Watson|Watson(?:\\s*.+\\s*){0,10}Holmes',
+     51),
+    ('quotes', u'["\'][^"\']{0,30}[?!.]["\']', 767),
+    ('line_boundary_sherlock_holmes',
+     u'(?m)^Sherlock Holmes|Sherlock Holmes$', 34),
+    ('word_ending_n', u'\\b\\w+n\\b', 8366),
+    ('repeated_class_negation', u'[a-q][^u-z]{13}x', 142),
+    ('ing_suffix', u'[a-zA-Z]+ing', 2824),
+    ('ing_suffix_limited_space', u'\\s[a-zA-Z]{0,12}ing\\s', 2081),
+]
+
+# Patterns that take exponential time in backtracking engines
+EXPONENTIAL = {'holmes_coword_watson'}
+
+# regexdna.rs: (name, pattern, count of matches)
+REGEXDNA = [
+    ('find_new_lines', u'>[^\\n]*\\n|\\n', 83337),
+    ('variant1', u'agggtaaa|tttaccct', 32),
+    ('variant2', u'[cgt]gggtaaa|tttaccc[acg]', 115),
+    ('variant3', u'a[act]ggtaaa|tttacc[agt]t', 368),
+    ('variant4', u'ag[act]gtaaa|tttac[agt]ct', 254),
+    ('variant5', u'agg[act]taaa|ttta[agt]cct', 466),
+    ('variant6', u'aggg[acg]aaa|ttt[cgt]ccct', 135),
+    ('variant7', u'agggt[cgt]aa|tt[acg]accct', 137),
+    ('variant8', u'agggta[cgt]a|t[acg]taccct', 139),
+    ('variant9', u'agggtaa[cgt]|[acg]ttaccct', 197),
+    ('subst1', u'B', 29963),
+    ('subst6', u'N', 29959),
+]
+
+# misc.rs: (name, pattern, haystack builder), haystacks that match
+MISC_SHORT = [
+    ('literal', u'y', lambda: u'x' * 50 + u'y'),
+    ('not_literal', u'.y', lambda: u'x' * 50 + u'y'),
+    ('match_class', u'[abcdw]', lambda: u'xxxx' * 20 + u'w'),
+    ('match_class_in_range', u'[ac]', lambda: u'bbbb' * 20 + u'c'),
+    ('match_class_unicode', u'\\p{L}',
+     lambda: u'☃5☃5' * 20 + u'a'),
+    ('anchored_literal_short_match', u'^.bc(d|e)',
+     lambda: u'abcdefghijklmnopqrstuvwxyz'),
+    ('anchored_literal_long_match', u'^.bc(d|e)',
+     lambda: u'abcdefghijklmnopqrstuvwxyz' * 15),
+    ('one_pass_short', u'^.bc(d|e)*$', lambda: u'abcddddddeeee'),
+    ('one_pass_long_prefix', u'^abcdefghijklmnopqrstuvwxyz.*$',
+     lambda: u'abcdefghijklmnopqrstuvwxyz'),
+    ('long_needle1', u'a' * 30 + u'b', lambda: u'a' * 100000 + u'b'),
+]
+
+# misc.rs: (name, pattern, suffix) searched at the end of each text file
+MISC_SIZES = ['32', '1K', '32K', '1MB']
+MISC_SUFFIXED = [
+    ('easy0', u'ABCDEFGHIJKLMNOPQRSTUVWXYZ$', u'ABCDEFGHIJKLMNOPQRSTUVWXYZ'),
+    ('easy1', u'A[AB]B[BC]C[CD]D[DE]E[EF]F[FG]G[GH]H[HI]I[IJ]J$',
+     u'AABCCCDEEEFGGHHHIJJ'),
+    ('medium', u'[XYZ]ABCDEFGHIJKLMNOPQRSTUVWXYZ$',
+     u'XABCDEFGHIJKLMNOPQRSTUVWXYZ'),
+    ('hard', u'[ -~]*ABCDEFGHIJKLMNOPQRSTUVWXYZ$',
+     u'ABCDEFGHIJKLMNOPQRSTUVWXYZ'),
+    ('reallyhard', u'[ -~]*ABCDEFGHIJKLMNOPQRSTUVWXYZ.*',
+     u'ABCDEFGHIJKLMNOPQRSTUVWXYZ'),
+]
+
+# misc.rs short_haystack_*: captures of one match in a growing haystack
+SHORT_HAYSTACK = [1, 2, 3, 4, 10, 100, 1000, 10000, 100000]
+
+# misc.rs is_match_set and matches_set
+SET_PATTERNS = [u'aaaaaaaaaaaaaaaaaaa', u'abc579', u'def.+', u'e24fg',
+                u'a.*2c', u'23.']
+SET_HAYSTACK = u'a' * 10 + u'a482c' + u'b' * 10
+NAMES = [u'Sherlock', u'Holmes', u'Watson', u'Irene', u'Adler', u'John',
+         u'Baker']
+
+
+def _count(iterator):
+    count = 0
+    for _ in iterator:
+        count += 1
+    return count
+
+
+class Engine(object):
+    """ Adapts the API of a regex engine to the benchmarked operations,
+    each returning a result comparable between engines.
+    """
+
+    backtracking = False
+
+    def __init__(self, name, compile, purge=None, encode=None,
+                 compile_set=None, set_matches=None):
+        self.name = name
+        self._compile = compile
+        self._purge = purge
+        self.encode = encode or (lambda text: text)
+        self._compile_set = compile_set
+        self._set_matches = set_matches
+
+    def compile(self, pattern):
+        if self._purge is not None:
+            self._purge()
+        return self._compile(pattern)
+
+    def is_match(self, compiled, haystack):
+        return compiled.search(haystack) is not None
+
+    def find(self, compiled, haystack):
+        return compiled.search(haystack) is not None
+
+    def find_iter(self, compiled, haystack):
+        return _count(compiled.finditer(haystack))
+
+    def captures_iter(self, compiled, haystack):
+        return _count(compiled.finditer(haystack))
+
+    def compile_set(self, patterns):
+        if self._compile_set is not None:
+            return self._compile_set(patterns)
+        # A set is emulated with an alternation for is_match, and with one
+        # search per pattern for matches.
+        return (self.compile(u'|'.join(u'(?:{})'.format(pattern)
+                                       for pattern in patterns)),
+                [self.compile(pattern) for pattern in patterns])
+
+    def set_is_match(self, compiled, haystack):
+        if self._compile_set is not None:
+            return compiled.is_match(haystack)
+        return compiled[0].search(haystack) is not None
+
+    def set_matches(self, compiled, haystack):
+        if self._compile_set is not None:
+            return list(compiled.matches(haystack))
+        return [each.search(haystack) is not None for each in compiled[1]]
+
+
+class RureEngine(Engine):
+
+    def __init__(self):
+        Engine.__init__(self, 'rure',
+                        lambda pattern: Rure(pattern.encode('utf8')),
+                        encode=lambda text: text.encode('utf8'),
+                        compile_set=lambda patterns: RureSet(
+                            *[pattern.encode('utf8') for pattern in patterns]))
+
+    def is_match(self, compiled, haystack):
+        return compiled.is_match(haystack)
+
+    def find(self, compiled, haystack):
+        return compiled.find(haystack) is not None
+
+    def find_iter(self, compiled, haystack):
+        return _count(compiled.find_iter(haystack))
+
+    def captures_iter(self, compiled, haystack):
+        return _count(compiled.captures_iter(haystack))
+
+
+class RureRegexEngine(Engine):
+
+    def __init__(self):
+        Engine.__init__(self, 'rure.regex', rure.compile, purge=rure.purge)
+
+    def is_match(self, compiled, haystack):
+        return compiled.is_match(haystack)
+
+    def find_iter(self, compiled, haystack):
+        return _count(compiled.finditer(haystack))
+
+    def captures_iter(self, compiled, haystack):
+        return _count(match.groups() for match in compiled.finditer(haystack))
+
+    def compile_set(self, patterns):
+        raise NotImplementedError("no set API")
+
+
+class BacktrackingEngine(Engine):
+
+    backtracking = True
+
+    def __init__(self, module):
+        Engine.__init__(self, module.__name__, module.compile,
+                        purge=module.purge)
+
+    def captures_iter(self, compiled, haystack):
+        return _count(match.groups() for match in compiled.finditer(haystack))
+
+
+def engines():
+    found = [RureEngine(), RureRegexEngine(), BacktrackingEngine(re)]
+    if regex is not None:
+        found.append(BacktrackingEngine(regex))
+    return found
+
+
+def read_data(data_dir, name):
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as fobj:
+        return fobj.read().decode('utf8')
+
+
+def benchmarks(data_dir):
+    """ Yields (group, name, kind, pattern, haystack, expected) tuples, where
+    expected is the result of the operation in the Rust benchmarks, if any.
+    """
+    sherlock = read_data(data_dir, 'sherlock.txt')
+    for name, pattern, count in SHERLOCK:
+        yield 'sherlock', name, 'compile', pattern, None, None
+    for name, pattern, count in SHERLOCK:
+        yield 'sherlock', name, 'find', pattern, sherlock, count > 0
+    for name, pattern, count in SHERLOCK:
+        yield 'sherlock', name, 'find_iter', pattern, sherlock, count
+    for name, pattern, count in SHERLOCK:
+        if name in ('before_holmes', 'before_after_holmes', 'name_alt4',
+                    'the_whitespace', 'quotes'):
+            yield ('sherlock', name, 'captures_iter', u'({})'.format(pattern),
+                   sherlock, count)
+    yield 'sherlock', 'names', 'set_matches', NAMES, sherlock, [True] * 7
+
+    dna = read_data(data_dir, 'regexdna.txt')
+    if dna is not None:
+        for name, pattern, count in REGEXDNA:
+            yield 'regexdna', name, 'find_iter', pattern, dna, count
+
+    for name, pattern, haystack in MISC_SHORT:
+        yield 'misc', name, 'is_match', pattern, haystack(), True
+    for size in MISC_SIZES:
+        text = read_data(data_dir, size + '.txt')
+        for name, pattern, suffix in MISC_SUFFIXED:
+            yield ('misc', '{}_{}'.format(name, size), 'is_match', pattern,
+                   text + suffix, True)
+    yield ('misc', 'reallyhard2_1K', 'is_match', u'\\w+\\s+Holmes',
+           read_data(data_dir, '1K.txt') + u'Sherlock Holmes', True)
+    for times in SHORT_HAYSTACK:
+        yield ('misc', 'short_haystack_{}x'.format(times), 'captures_iter',
+               u'(bbbb)cccc(bbb)',
+               u'aaaa' * times + u'bbbbccccbbb' + u'dddd' * times, 1)
+    yield ('misc', 'is_match_set', 'set_is_match', SET_PATTERNS,
+           SET_HAYSTACK, True)
+    yield ('misc', 'matches_set', 'set_matches', SET_PATTERNS,
+           SET_HAYSTACK, [False, False, False, False, True, False])
+
+
+def measure(fn, min_time, repeat):
+    """ Returns the best time of one call to fn, over repeat runs of enough
+    calls to take min_time seconds each.
+    """
+    number = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed * 10 >= min_time else 10
+    times = timeit.repeat(fn, number=number, repeat=max(repeat - 1, 0))
+    return min([elapsed] + times) / number
+
+
+def overheads(engine, min_time, repeat):
+    """ Returns the fixed cost of a call of each operation, on an empty
+    haystack, and the cost of each match yielded by the iterators, on a
+    haystack made only of one byte matches.
+    """
+    compiled = engine.compile(u'a')
+    empty = engine.encode(u'')
+    costs = {}
+    for kind in ('is_match', 'find', 'find_iter', 'captures_iter'):
+        method = getattr(engine, kind)
+        costs[kind] = measure(lambda: method(compiled, empty),
+                              min_time, repeat)
+    haystack = engine.encode(u'a' * 4096)
+    for kind in ('find_iter', 'captures_iter'):
+        method = getattr(engine, kind)
+        elapsed = measure(lambda: method(compiled, haystack),
+                          min_time, repeat)
+        costs[kind + '_per_match'] = max(elapsed - costs[kind], 0) / 4096
+    return costs
+
+
+def scanned_bytes(kind, pattern, haystack):
+    """ Returns the number of bytes of UTF-8 haystack an operation has to
+    search: up to the end of the first match for find, all of it otherwise.
+    """
+    encoded = haystack.encode('utf8')
+    if kind == 'find':
+        match = Rure(pattern.encode('utf8')).find(encoded)
+        if match is not None:
+            return match.end
+    return len(encoded)
+
+
+def run(engine, costs, bench, min_time, repeat):
+    group, name, kind, pattern, haystack, expected = bench
+    result = {'group': group, 'name': name, 'kind': kind,
+              'engine': engine.name, 'pattern': pattern}
+    if engine.backtracking and name in EXPONENTIAL and kind != 'compile':
+        result['skipped'] = 'exponential time'
+        return result
+    try:
+        if kind == 'compile':
+            seconds = measure(lambda: engine.compile(pattern),
+                              min_time, repeat)
+            result['seconds'] = seconds
+            return result
+        if kind.startswith('set_'):
+            compiled = engine.compile_set(pattern)
+        else:
+            compiled = engine.compile(pattern)
+    except NotImplementedError as exc:
+        result['skipped'] = str(exc)
+        return result
+    except Exception as exc:
+        result['error'] = '{}: {}'.format(type(exc).__name__, exc)
+        return result
+
+    nbytes = scanned_bytes(kind, pattern, haystack)
+    haystack = engine.encode(haystack)
+    method = getattr(engine, kind)
+    value = method(compiled, haystack)
+    seconds = measure(lambda: method(compiled, haystack), min_time, repeat)
+
+    overhead = costs.get(kind, 0)
+    if kind in ('find_iter', 'captures_iter'):
+        overhead += value * costs[kind + '_per_match']
+    scan = max(seconds - overhead, 0)
+    result.update(seconds=seconds, bytes=nbytes, result=value,
+                  overhead_seconds=overhead, scan_seconds=scan,
+                  scan_mb_per_s=nbytes / scan / 1e6 if scan else None)
+    if expected is not None and value != expected:
+        result['unexpected'] = expected
+    return result
+
+
+def format_result(result):
+    label = '{group}/{name} {kind}'.format(**result)
+    if 'seconds' not in result:
+        status = result.get('skipped') or result.get('error')
+        return '{:<52} {:<10} {}'.format(label, result['engine'], status)
+    line = '{:<52} {:<10} {:>12.1f} us'.format(label, result['engine'],
+                                               result['seconds'] * 1e6)
+    if result.get('scan_mb_per_s'):
+        line += ' {:>10.1f} MB/s'.format(result['scan_mb_per_s'])
+    if 'unexpected' in result:
+        line += ' (got {!r}, expected {!r})'.format(result['result'],
+                                                    result['unexpected'])
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='',
+                        help='regex matched against group/name kind')
+    parser.add_argument('--engines', default=None,
+                        help='comma separated engine names (default: all)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='minimum duration of a run, in seconds')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs, of which the best is kept')
+    parser.add_argument('--data', default=DATA_DIR,
+                        help='directory of the Rust benchmark data files')
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help='file the results are written to, as JSON')
+    args = parser.parse_args(argv)
+
+    selected = engines()
+    if args.engines:
+        names = args.engines.split(',')
+        selected = [engine for engine in selected if engine.name in names]
+    selection = re.compile(args.filter)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version,
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'regex_version': getattr(regex, '__version__', None),
+        'min_time': args.min_time,
+        'repeat': args.repeat,
+        'overheads': {},
+        'results': [],
+    }
+
+    print('Per-call overhead (us)')
+    for engine in selected:
+        costs = overheads(engine, args.min_time, args.repeat)
+        report['overheads'][engine.name] = costs
+        print('{:<10} '.format(engine.name) + ' '.join(
+            '{}={:.3f}'.format(kind, seconds * 1e6)
+            for kind, seconds in sorted(costs.items())))
+    print()
+
+    for bench in benchmarks(args.data):
+        group, name, kind = bench[:3]
+        if not selection.search('{}/{} {}'.format(group, name, kind)):
+            continue
+        for engine in selected:
+            result = run(engine, report['overheads'][engine.name], bench,
+                         args.min_time, args.repeat)
+            report['results'].append(result)
+            print(format_result(result))
+            sys.stdout.flush()
+
+    if args.json_path:
+        with open(args.json_path, 'w') as fobj:
+            json.dump(report, fobj, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
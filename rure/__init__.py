@@ -1,14 +1,23 @@
 import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing import cpu_count
 
 from rure.lib import Rure, RureSet
 from rure.lib import DEFAULT_FLAGS
 from rure.lib import CASEI, MULTI, DOTNL, SWAP_GREED, SPACE, UNICODE
+from rure import regex
 from rure.regex import RegexObject
+from rure.cache import LRUCache
 
 
 __all__ = [
     "Rure", "RegexObject",
-    "compile", "search", "is_match", "match", "findall", "finditer",
+    "compile", "search", "is_match", "match", "fullmatch", "findall",
+    "finditer", "sub", "subn", "purge", "cache_info", "set_cache_size",
+    "set_string_cache_size",
+    "compile_many",
     "DEFAULT_FLAGS",
     "CASEI", "MULTI", "DOTNL", "SWAP_GREED", "SPACE", "UNICODE",
     "I", "IGNORECASE", "L", "LOCALE", "U", "M", "MULTILINE", "S",
@@ -24,25 +33,115 @@ S = DOTALL = re.S
 X = VERBOSE = re.X
 
 
+# Patterns compiled by the functions below, most recently used last.
+_cache = LRUCache()
+
+
 def compile(pattern, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options)
+    key = (type(pattern), pattern, flags, tuple(sorted(options.items())))
+    return _cache.get(
+        key, lambda: RegexObject(pattern, flags=flags, **options))
+
+
+def purge():
+    """Clears the cache of compiled patterns and its statistics, and the
+    cache of encoded strings."""
+    _cache.clear()
+    regex._encoded_strings.clear()
+
+
+def cache_info():
+    """Returns the hits, misses, evictions, maxsize and currsize of the
+    cache of compiled patterns."""
+    return _cache.info()
+
+
+def set_cache_size(maxsize):
+    """Sets the maximum number of compiled patterns cached (0 disables
+    the cache)."""
+    _cache.resize(maxsize)
+
+
+def set_string_cache_size(maxsize):
+    """Sets the maximum number of long strings whose UTF-8 encoding is
+    cached for RegexObject searches (0 disables the cache). Cached strings
+    are kept alive until they are evicted or purge is called."""
+    regex._encoded_strings.resize(maxsize)
+
+
+CompileResults = namedtuple("CompileResults", ("compiled", "errors"))
+
+
+def compile_many(patterns, flags=None, workers=None, callback=None, **options):
+    """Compiles the sequence patterns on a thread pool, into a Rure for each
+    byte string and a RegexObject for each unicode string. The GIL is
+    released while the C library compiles, so patterns are compiled in
+    parallel.
+
+    A pattern that fails to compile does not abort the batch: returns
+    ``CompileResults(compiled, errors)``, two lists in the order of
+    patterns, holding either the compiled object and None, or None and the
+    exception raised.
+
+    :param flags:    Flags for every pattern: rure flags for byte strings
+                     (default: DEFAULT_FLAGS), re flags for unicode strings
+    :param workers:  Number of threads (default: number of CPUs)
+    :param callback: Called as ``callback(index, seconds, error)`` in the
+                     calling thread as each pattern is done, e.g. to report
+                     progress
+    """
+    def compile_one(pattern):
+        started = time.time()
+        try:
+            if isinstance(pattern, bytes):
+                compiled = Rure(pattern, flags=DEFAULT_FLAGS
+                                if flags is None else flags, **options)
+            else:
+                compiled = RegexObject(pattern, flags=flags or 0, **options)
+        except Exception as err:
+            return None, err, time.time() - started
+        return compiled, None, time.time() - started
+
+    compiled = [None] * len(patterns)
+    errors = [None] * len(patterns)
+    with ThreadPoolExecutor(workers or cpu_count()) as pool:
+        futures = dict((pool.submit(compile_one, pattern), i)
+                       for i, pattern in enumerate(patterns))
+        for future in as_completed(futures):
+            i = futures[future]
+            compiled[i], errors[i], elapsed = future.result()
+            if callback is not None:
+                callback(i, elapsed, errors[i])
+    return CompileResults(compiled, errors)
 
 
 def search(pattern, string, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options).search(string)
+    return compile(pattern, flags, **options).search(string)
 
 
 def is_match(pattern, string, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options).is_match(string)
+    return compile(pattern, flags, **options).is_match(string)
 
 
 def match(pattern, string, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options).match(string)
+    return compile(pattern, flags, **options).match(string)
+
+
+def fullmatch(pattern, string, flags=0, **options):
+    return compile(pattern, flags, **options).fullmatch(string)
 
 
 def findall(pattern, string, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options).findall(string)
+    return compile(pattern, flags, **options).findall(string)
 
 
 def finditer(pattern, string, flags=0, **options):
-    return RegexObject(pattern, flags=flags, **options).finditer(string)
+    return compile(pattern, flags, **options).finditer(string)
+
+
+def sub(pattern, repl, string, count=0, flags=0, **options):
+    return compile(pattern, flags, **options).sub(repl, string, count)
+
+
+def subn(pattern, repl, string, count=0, flags=0, **options):
+    return compile(pattern, flags, **options).subn(repl, string, count)
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+
+
+# Haystacks of fewer bytes than this are searched on the event loop thread.
+DEFAULT_INLINE_THRESHOLD = 1 << 16
+
+_inline_threshold = DEFAULT_INLINE_THRESHOLD
+_executor = None
+
+
+def configure(inline_threshold=None, executor=None):
+    """ Sets the size, in bytes, from which haystacks are searched on an
+    executor, and the concurrent.futures executor used (None for the
+    default executor of the event loop).
+    """
+    global _inline_threshold, _executor
+    if inline_threshold is not None:
+        _inline_threshold = inline_threshold
+    _executor = executor
+
+
+def _nbytes(haystack):
+    if isinstance(haystack, bytes):
+        return len(haystack)
+    return memoryview(haystack).nbytes
+
+
+async def offload(method, haystack, *args, **kwargs):
+    """ Returns the result of ``method(haystack, *args, **kwargs)``. Short
+    haystacks are searched right away on the event loop thread, where a
+    hand-off would cost more than the search. Haystacks at least as large
+    as the inline threshold are searched on the executor, and since the C
+    library releases the GIL while it scans, the event loop keeps running.
+
+    Cancelling the awaiting task raises CancelledError in it right away.
+    The scan itself cannot be interrupted: it runs to completion on its
+    worker thread and its result is discarded, so a mutable haystack must
+    not be modified until then.
+    """
+    if _nbytes(haystack) < _inline_threshold:
+        return method(haystack, *args, **kwargs)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(method, haystack, *args, **kwargs))
+
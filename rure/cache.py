@@ -0,0 +1,79 @@
+from collections import OrderedDict, namedtuple
+from threading import Lock
+
+
+# Default number of compiled patterns kept by the module-level functions,
+# as in the re module.
+DEFAULT_MAXSIZE = 512
+
+CacheInfo = namedtuple("CacheInfo",
+                       ("hits", "misses", "evictions", "maxsize", "currsize"))
+
+
+class LRUCache(object):
+    """ A thread-safe cache, such as of compiled patterns, bounded to maxsize
+    entries and evicting the least recently used one when full.
+
+    Values are created outside of the lock, so a slow compile does not
+    hold up lookups of other patterns. Two threads creating the same
+    missing value at once both do the work, and the first result stored
+    is the one kept.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, factory):
+        """ Returns the object cached for key, calling factory() to create
+        it on a miss. Keys that are not hashable bypass the cache.
+        """
+        try:
+            hash(key)
+        except TypeError:
+            return factory()
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries[key] = value
+                return value
+
+        value = factory()
+        with self._lock:
+            value = self._entries.setdefault(key, value)
+            self._evict(self.maxsize)
+        return value
+
+    def _evict(self, maxsize):
+        while len(self._entries) > max(maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """ Changes the maximum number of entries, evicting the least
+        recently used ones if there are now too many. A maxsize of 0
+        disables caching.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict(maxsize)
+
+    def clear(self):
+        """ Empties the cache and resets its statistics.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """ Returns the CacheInfo statistics of the cache.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.maxsize, len(self._entries))
@@ -0,0 +1,239 @@
+import mmap
+import multiprocessing
+import os
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+from rure.lib import Rure, RureSet
+
+
+# Approximate number of bytes of documents sent to a worker at a time.
+DEFAULT_BATCH_SIZE = 1 << 22
+
+# The compiled Rure or RureSet of a worker process.
+_worker_re = None
+
+
+def _compile(patterns, options):
+    if isinstance(patterns, bytes):
+        return Rure(patterns, **options)
+    return RureSet(*patterns, **options)
+
+
+def _init_worker(patterns, options):
+    global _worker_re
+    _worker_re = _compile(patterns, options)
+
+
+def _scan(scan, document, kwargs):
+    try:
+        return scan(document, **kwargs)
+    except Exception as error:
+        # The frames of the traceback hold buffers exported from document,
+        # which could then not be released, nor its memory closed, and the
+        # BufferError raised would hide this error.
+        traceback.clear_frames(error.__traceback__)
+        raise
+
+
+def _scan_shared(name, spans, method, kwargs):
+    """ Applies method to the documents at spans of the shared memory block
+    name, searching them in place.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        scan = getattr(_worker_re, method)
+        results = []
+        for start, end in spans:
+            document = shm.buf[start:end]
+            try:
+                results.append(_scan(scan, document, kwargs))
+            finally:
+                document.release()
+        return results
+    finally:
+        shm.close()
+
+
+def _scan_files(paths, method, kwargs):
+    """ Applies method to the files at paths, memory-mapped rather than
+    read.
+    """
+    scan = getattr(_worker_re, method)
+    results = []
+    for path in paths:
+        with open(path, 'rb') as fobj:
+            if not os.fstat(fobj.fileno()).st_size:
+                # Empty files cannot be mapped.
+                results.append(scan(b'', **kwargs))
+                continue
+            mapped = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            results.append(_scan(scan, mapped, kwargs))
+        finally:
+            mapped.close()
+    return results
+
+
+class CorpusScanner(object):
+    """ Searches a corpus of documents on a pool of worker processes, for
+    jobs that need more CPU than one interpreter provides.
+
+    Each worker compiles the patterns once, when it starts. Documents are
+    not pickled through pipes: they are copied in batches into shared
+    memory blocks that workers search in place (scan), or workers map the
+    files they are given (scan_files). At most max_in_flight batches are
+    pending at any time, which bounds the memory held by documents and
+    results waiting to be consumed.
+
+    Results are the return values of the method named method of the
+    compiled object, and must therefore be picklable: e.g. find_all,
+    captures_all or count for a Rure, or matches or find_matches for a
+    RureSet, but not captures, whose Captures types are created at run
+    time.
+    """
+
+    def __init__(self, patterns, method, workers=None, max_in_flight=None,
+                 batch_size=DEFAULT_BATCH_SIZE, **options):
+        """
+        :param patterns:      Byte string pattern compiled to a Rure, or
+                              sequence of them compiled to a RureSet
+        :param method:        Name of the method searching each document
+        :param workers:       Number of worker processes (default: number of
+                              CPUs)
+        :param max_in_flight: Maximum number of pending batches (default:
+                              twice the number of workers)
+        :param batch_size:    Approximate number of bytes per batch
+        :param options:       Options passed to Rure or RureSet (flags,
+                              size_limit, ...)
+        """
+        if not isinstance(patterns, bytes):
+            patterns = list(patterns)
+        # Fail early, in this process, on invalid patterns or methods.
+        compiled = _compile(patterns, options)
+        if not callable(getattr(compiled, method, None)):
+            raise ValueError("{!r} is not a method of {}".format(
+                method, type(compiled).__name__))
+
+        self.method = method
+        self.workers = workers or multiprocessing.cpu_count()
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.batch_size = batch_size
+        self._pool = ProcessPoolExecutor(self.workers,
+                                         initializer=_init_worker,
+                                         initargs=(patterns, options))
+
+    def close(self):
+        """ Shuts the worker processes down. """
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def scan(self, documents, ordered=True, **kwargs):
+        """ Returns an iterator of ``(index, result)`` pairs, giving the
+        result of method for the document at each index of the iterable
+        documents (byte strings or other contiguous buffers). Results come
+        in index order if ordered, or else as soon as they are ready.
+
+        Keyword arguments (e.g. start) are passed on to method.
+        """
+        return self._stream(self._shared_jobs(documents, kwargs), ordered)
+
+    def scan_files(self, paths, ordered=True, **kwargs):
+        """ Like scan, for the files at paths, which workers memory-map
+        instead of receiving their contents.
+        """
+        return self._stream(self._file_jobs(paths, kwargs), ordered)
+
+    def _batches(self, items, size):
+        batch = []
+        batch_bytes = 0
+        first = 0
+        for i, item in enumerate(items):
+            batch.append(item)
+            batch_bytes += size(item)
+            if batch_bytes >= self.batch_size:
+                yield first, batch, batch_bytes
+                first = i + 1
+                batch = []
+                batch_bytes = 0
+        if batch:
+            yield first, batch, batch_bytes
+
+    def _shared_jobs(self, documents, kwargs):
+        views = (memoryview(document).cast('B') for document in documents)
+        for first, batch, batch_bytes in self._batches(
+                views, lambda view: view.nbytes):
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(batch_bytes, 1))
+            spans = []
+            offset = 0
+            for view in batch:
+                shm.buf[offset:offset + view.nbytes] = view
+                spans.append((offset, offset + view.nbytes))
+                offset += view.nbytes
+
+            def release(shm=shm):
+                shm.close()
+                shm.unlink()
+            yield first, (_scan_shared, shm.name, spans, self.method,
+                          kwargs), release
+
+    def _file_jobs(self, paths, kwargs):
+        for first, batch, _ in self._batches(paths, os.path.getsize):
+            yield first, (_scan_files, batch, self.method, kwargs), None
+
+    def _stream(self, jobs, ordered):
+        pending = deque()
+        try:
+            while True:
+                # Make room before the next batch is copied, so that no
+                # shared memory block exists outside of pending.
+                while len(pending) >= self.max_in_flight:
+                    for item in self._complete(pending, ordered):
+                        yield item
+                try:
+                    first, job, release = next(jobs)
+                except StopIteration:
+                    break
+                pending.append((first, self._pool.submit(*job), release))
+            while pending:
+                for item in self._complete(pending, ordered):
+                    yield item
+        finally:
+            # Abandoned: drop the batches not started yet, and let those
+            # running finish with their shared memory before releasing it.
+            for first, future, release in pending:
+                if not future.cancel():
+                    wait([future])
+                if release is not None:
+                    release()
+
+    def _complete(self, pending, ordered):
+        """ Waits for the first pending batch, or for any of them unless
+        ordered, and returns the results of the batches done.
+        """
+        if ordered:
+            done = [pending.popleft()]
+        else:
+            futures = set(wait([future for _, future, _ in pending],
+                               return_when=FIRST_COMPLETED).done)
+            done = [job for job in pending if job[1] in futures]
+            for job in done:
+                pending.remove(job)
+
+        items = []
+        for first, future, release in done:
+            try:
+                results = future.result()
+            finally:
+                if release is not None:
+                    release()
+            items.extend(enumerate(results, first))
+        return items
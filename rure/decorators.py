@@ -1,20 +1,50 @@
 from functools import wraps
 
+from rure import _native
+
+
+def _caller(cls_instance, f):
+    return "'{}.{}.{}'".format(
+        cls_instance.__module__,
+        type(cls_instance).__name__,
+        f.__name__
+    )
+
+
+def to_buffer(string):
+    """Returns string itself if it is a byte string, or else a cffi view of
+    the memory of the contiguous buffer-protocol object string (bytearray,
+    memoryview, mmap, numpy array, ...), which avoids copying it.
+
+    Views created earlier are passed through as they are.
+
+    The view holds on to the exported buffer for as long as it is alive,
+    so an object such as a bytearray cannot be resized while a search
+    over it is running.
+    """
+    if isinstance(string, (bytes, _native.ffi.CData)):
+        return string
+    try:
+        return _native.ffi.from_buffer(string)
+    except (TypeError, BufferError):
+        raise TypeError("a bytes-like object with a contiguous buffer is "
+                        "required, not '{}'".format(type(string).__name__))
+
 
 def accepts_bytes(f):
-    """Decorator for instance methods that accept only byte strings as
-    first argument.
+    """Decorator for instance methods that accept only byte strings or
+    contiguous buffer-protocol objects as first argument. Buffers are
+    passed on as cffi views of their memory (see to_buffer).
     """
     @wraps(f)
     def wrapper(cls_instance, string, *args, **kwargs):
-        caller = "'{}.{}.{}'".format(
-            cls_instance.__module__,
-            type(cls_instance).__name__,
-            f.__name__
-        )
-        err_msg =  "{} requires a first argument of type 'bytes'".format(caller)
-        if not isinstance(string, bytes):
-            raise TypeError(err_msg)
+        if not isinstance(string, (bytes, _native.ffi.CData)):
+            try:
+                string = _native.ffi.from_buffer(string)
+            except (TypeError, BufferError):
+                raise TypeError("{} requires a first argument of type "
+                                "'bytes' or a contiguous buffer".format(
+                                    _caller(cls_instance, f)))
         return f(cls_instance, string, *args, **kwargs)
     return wrapper
 
@@ -25,14 +55,8 @@ def accepts_string(f):
     """
     @wraps(f)
     def wrapper(cls_instance, string, *args, **kwargs):
-        caller = "'{}.{}.{}'".format(
-            cls_instance.__module__,
-            type(cls_instance).__name__,
-            f.__name__
-        )
-        err_msg =  "{} requires unicode string as its first argument".format(
-            caller)
         if isinstance(string, bytes):
-            raise TypeError(err_msg)
+            raise TypeError("{} requires unicode string as its first "
+                            "argument".format(_caller(cls_instance, f)))
         return f(cls_instance, string, *args, **kwargs)
     return wrapper
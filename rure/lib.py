@@ -1,10 +1,20 @@
+import hashlib
+import mmap
+import multiprocessing
 import os
 import sys
+from array import array
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 from . import _native
+from six import indexbytes
+
 from rure import exceptions
-from rure.decorators import accepts_bytes
+from rure import literals
+from rure import metrics
+from rure import template
+from rure.decorators import accepts_bytes, to_buffer
 
 
 CASEI = 1 << 0
@@ -15,8 +25,37 @@ SPACE = 1 << 4
 UNICODE = 1 << 5
 DEFAULT_FLAGS = UNICODE
 
+# Typecode of an ``array`` whose items have the width of ``size_t``, the type
+# the C library reports match offsets in.
+OFFSET_TYPECODE = 'Q' if _native.ffi.sizeof('size_t') == 8 else 'I'
+# Signed counterpart of OFFSET_TYPECODE, used where -1 marks a group that
+# did not participate in a match.
+CAPTURE_TYPECODE = OFFSET_TYPECODE.lower()
+# size_t value that reads back as -1 through a CAPTURE_TYPECODE array.
+_NO_OFFSET = (1 << (8 * _native.ffi.sizeof('size_t'))) - 1
+# Number of matches collected per native buffer before flushing to Python.
+_MATCH_CHUNK = 1024
+# Number of bytes scanned at a time when counting newlines in a file.
+_LINE_CHUNK = 1 << 20
+# Minimum haystack length for which the shards of a RureSet are searched in
+# parallel.
+_PARALLEL_SCAN = 1 << 16
+
 
 RureMatch = namedtuple("RureMatch", ("start", "end"))
+LineMatch = namedtuple("LineMatch",
+                       ("line_number", "line_start", "start", "end"))
+_SetShard = namedtuple("_SetShard", ("offset", "size", "ptr"))
+SetMatch = namedtuple("SetMatch", ("index", "start", "end"))
+SetCaptures = namedtuple("SetCaptures", ("index", "start", "end", "captures"))
+RureInfo = namedtuple("RureInfo",
+                      ("program_size", "instructions", "captures",
+                       "prefixes", "suffixes", "anchored_start",
+                       "anchored_end", "engine", "nfa_on_non_ascii"))
+
+# Size in bytes of an instruction of a compiled program, measured on first
+# use by _instruction_size.
+_inst_size = None
 
 
 def checked_call(fn, err, *args):
@@ -34,6 +73,207 @@ def checked_call(fn, err, *args):
         raise exceptions.RegexError(msg)
 
 
+def _map_chunks(fn, haystacks, workers=None, executor=None, chunksize=None):
+    """ Splits the sequence haystacks into contiguous chunks, applies fn to
+    each chunk on a thread pool and returns the results in input order.
+
+    The C library releases the GIL for the duration of every search, so the
+    native scanning of different chunks proceeds in parallel.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, -(-len(haystacks) // (workers * 4)))
+    chunks = [haystacks[i:i + chunksize]
+              for i in range(0, len(haystacks), chunksize)]
+    if executor is not None:
+        return list(executor.map(fn, chunks))
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(fn, chunks))
+
+
+def _rure_is_match_at(re, haystack, length, start):
+    # rure_is_match and rure_shortest_match index past the haystack when
+    # given a non-zero start for a pattern anchored at the end of text, so
+    # searches that don't start at 0 go through rure_find instead.
+    return _native.lib.rure_find(re, haystack, length, start, _native.ffi.NULL)
+
+
+def _rure_set_is_match_at(re, haystack, length, start):
+    # See _rure_is_match_at.
+    matches = _native.ffi.new("bool[]", _native.lib.rure_set_len(re))
+    return _native.lib.rure_set_matches(re, haystack, length, start, matches)
+
+
+def _aio():
+    # Imported on first use: it requires Python 3.5 or later.
+    from rure import aio
+    return aio
+
+
+def _search_len(haystack, end):
+    """ Returns the length of the prefix of haystack searched by a window
+    ending at end (None for the whole haystack). It is clamped to the size
+    of the haystack so that the engine never reads past it.
+    """
+    hlen = len(haystack)
+    if end is None or end >= hlen:
+        return hlen
+    return max(end, 0)
+
+
+def _flag_indices(flags):
+    """ Yields the indices of the set items of flags, the bytes of a C bool
+    array, in increasing order.
+    """
+    i = flags.find(b'\x01')
+    while i >= 0:
+        yield i
+        i = flags.find(b'\x01', i + 1)
+
+
+def _size_limit(compile, free):
+    """ Returns the smallest size_limit under which compile(options, err)
+    succeeds, freeing what it returns with free.
+    """
+    def fits(size_limit):
+        opts = _native.ffi.gc(_native.lib.rure_options_new(),
+                              _native.lib.rure_options_free)
+        _native.lib.rure_options_size_limit(opts, size_limit)
+        # The error is left as is by a successful compilation, so each
+        # attempt needs a fresh one.
+        err = _native.ffi.gc(_native.lib.rure_error_new(),
+                             _native.lib.rure_error_free)
+        try:
+            free(checked_call(compile, err, opts))
+        except exceptions.CompiledTooBigError:
+            return False
+        return True
+
+    low, high = 0, 64
+    while not fits(high):
+        low, high = high + 1, high * 2
+    while low < high:
+        middle = (low + high) // 2
+        if fits(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+def _measurable(re):
+    """ Returns re followed by an empty group, so that its whole program is
+    compiled before the size limit is checked for the last time, before the
+    final match instruction.
+    """
+    # A line break ends a trailing comment of a verbose pattern.
+    return b"(?:" + re + (b"(?x)\n" if b"#" in re else b"") + b")(?:)"
+
+
+def _program_size(res, flags):
+    """ Returns the size in bytes of the program of the regex res, or of the
+    regex set res if it is a list, compiled with flags.
+    """
+    return _program_size_limit(res, flags) + _instruction_size()
+
+
+def _program_size_limit(res, flags):
+    """ Returns the smallest size_limit under which res compiles once made
+    measurable, i.e. the size of its program but for the last instruction.
+    """
+    if isinstance(res, bytes):
+        re = _measurable(res)
+        compile = lambda opts, err: _native.lib.rure_compile(
+            re, len(re), flags, opts, err)
+        free = _native.lib.rure_free
+    else:
+        res = res[:-1] + [_measurable(res[-1])]
+        patterns = [_native.ffi.new("uint8_t []", re) for re in res]
+        compile = lambda opts, err: _native.lib.rure_compile_set(
+            _native.ffi.new("uint8_t *[]", patterns),
+            _native.ffi.new("size_t []", [len(re) for re in res]),
+            len(res), flags, opts, err)
+        free = _native.lib.rure_set_free
+    return _size_limit(compile, free)
+
+
+def _instruction_size():
+    global _inst_size
+    if _inst_size is None:
+        _inst_size = (_program_size_limit(b"aa", 0) -
+                      _program_size_limit(b"a", 0))
+    return _inst_size
+
+
+def _common_length(literals, reverse=False):
+    """ Returns the number of characters all of literals start (or, if
+    reverse, end) with.
+    """
+    if not literals:
+        return 0
+    if reverse:
+        literals = [literal[::-1] for literal in literals]
+    common = os.path.commonprefix(literals)
+    if reverse:
+        common = common[::-1]
+    return len(common.decode('utf8', 'ignore'))
+
+
+def _engine(found, dfa):
+    """ Returns the name of the engine the regex crate uses to search for a
+    regex of Literals found, or None if unknown, as in its exec module.
+    """
+    if found is not None and found.complete:
+        return 'literal'
+    if not dfa:
+        return 'nfa'
+    if found is None:
+        return None
+    if found.anchored_end and not found.anchored_start:
+        return 'dfa_anchored_reverse'
+    suffix = _common_length(found.suffixes, reverse=True)
+    if suffix >= 3 and suffix > _common_length(found.prefixes):
+        return 'dfa_suffix'
+    return 'dfa'
+
+
+def _analyze(re, flags):
+    return literals.analyze(re, bool(flags & CASEI), bool(flags & MULTI),
+                            bool(flags & UNICODE))
+
+
+class _LineTracker(object):
+    """ Resolves increasing byte offsets of a buffer to 1-based line numbers
+    and line start offsets.
+
+    Newlines are only counted between consecutive lookups, a bounded chunk
+    at a time, so no index of the whole buffer is ever built.
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+        self.line_number = 1
+        self.line_start = 0
+
+    def locate(self, offset):
+        buf = self.buf
+        pos = self.pos
+        while pos < offset:
+            end = min(offset, pos + _LINE_CHUNK)
+            self.line_number += buf[pos:end].count(b'\n')
+            pos = end
+        if offset > self.pos:
+            # Only the range just counted: on a long line, searching back
+            # to its start for every match would be quadratic.
+            newline = buf.rfind(b'\n', self.pos, offset)
+            if newline >= 0:
+                self.line_start = newline + 1
+            self.pos = offset
+        return self.line_number, self.line_start
+
+
 class Rure(object):
     """ A compiled regular expression for matching Unicode strings.
 
@@ -47,10 +287,14 @@ class Rure(object):
     While this crate will handle Unicode strings (whether in the regular
     expression or in the search text), all positions returned are byte indices.
     Every byte index is guaranteed to be at a Unicode code point boundary.
+
+    Haystacks may be byte strings or any object exposing a contiguous buffer
+    (bytearray, memoryview, mmap, numpy uint8 arrays, ...); the latter are
+    searched in place without being copied.
     """
 
     def __init__(self, re, _pointer=None,
-                 flags=DEFAULT_FLAGS, **options):
+                 flags=DEFAULT_FLAGS, _utf8=False, **options):
         """ Compiles a regular expression. Once compiled, it can be used
         repeatedly to search, split or replace text in a string.
 
@@ -65,12 +309,18 @@ class Rure(object):
         self._err = _native.ffi.gc(_native.lib.rure_error_new(), _native.lib.rure_error_free)
         self._opts = _native.ffi.gc(_native.lib.rure_options_new(), _native.lib.rure_options_free)
 
+        self.pattern = re
+        self.flags = flags
         self.options = options
         if 'size_limit' in options:
             _native.lib.rure_options_size_limit(self._opts, options['size_limit'])
         if 'dfa_size_limit' in options:
             _native.lib.rure_options_dfa_size_limit(self._opts,
                                              options['dfa_size_limit'])
+        # Set by RegexObject, whose haystacks are always valid UTF-8 byte
+        # strings, to resume after an empty match at the next character
+        # rather than the next byte (see _after_empty).
+        self._utf8 = _utf8
 
         if _pointer is None:
             s = checked_call(
@@ -84,9 +334,10 @@ class Rure(object):
         else:
             s = _pointer
         self._ptr = _native.ffi.gc(s, _native.lib.rure_free)
+        self._capture_names = tuple(self._iter_capture_names())
         self.capture_cls = namedtuple(
             'Captures',
-            [i.decode('utf8') if i else u'' for i in self.capture_names()],
+            [i.decode('utf8') if i else u'' for i in self._capture_names],
             rename=True
         )
 
@@ -107,6 +358,9 @@ class Rure(object):
         None indicates an unnamed capture; the first element (capture 0,
         the whole matched region) is always unnamed.
         """
+        return iter(self._capture_names)
+
+    def _iter_capture_names(self):
         cn_iter = _native.ffi.gc(_native.lib.rure_iter_capture_names_new(self._ptr),
                          _native.lib.rure_iter_capture_names_free)
         ptr = _native.ffi.new('char **')
@@ -118,22 +372,34 @@ class Rure(object):
                 yield None
 
     @accepts_bytes
-    def is_match(self, haystack, start=0):
+    @metrics.instrumented(metrics.found)
+    def is_match(self, haystack, start=0, end=None):
         """ Returns true if and only if the regex matches the string given.
 
         It is recommended to use this method if all you need to do is test
         a match, since the underlying matching engine may be able to do less
         work.
+
+        Like every search method, this searches the window of text between
+        the byte offsets start and end (the end of text by default) without
+        copying it. Text after end is not seen at all: end is the end of
+        text for \\b and $ alike. The character before start is seen by
+        \\b, but only reliably when it is ASCII: a non-ASCII character there
+        may be taken for a non-word character, in which case find, is_match
+        and captures can disagree on whether a match starts at start.
         """
-        return bool(_native.lib.rure_is_match(
+        hlen = _search_len(haystack, end)
+        is_match = _rure_is_match_at if start else _native.lib.rure_is_match
+        return start <= hlen and bool(is_match(
             self._ptr,
             haystack,
-            len(haystack),
+            hlen,
             start
         ))
 
     @accepts_bytes
-    def find(self, haystack, start=0):
+    @metrics.instrumented(metrics.found)
+    def find(self, haystack, start=0, end=None):
         """ Returns the start and end byte range of the leftmost-first match
         in text. If no match exists, then None is returned.
 
@@ -141,39 +407,262 @@ class Rure(object):
         of the match. Testing the existence of a match is faster if you use
         is_match.
         """
+        hlen = _search_len(haystack, end)
         match = _native.ffi.new('rure_match *')
-        if _native.lib.rure_find(
+        if start <= hlen and _native.lib.rure_find(
             self._ptr,
             haystack,
-            len(haystack),
+            hlen,
             start,
             match
         ):
             return RureMatch(match.start, match.end)
 
+    def is_match_many(self, haystacks, start=0):
+        """ Tests every haystack in the sequence haystacks, returning a
+        bytearray holding 1 for each haystack the regex matches and 0 for
+        the others.
+
+        This avoids the per-call overhead of is_match when testing many
+        short haystacks.
+        """
+        is_match = _rure_is_match_at if start else _native.lib.rure_is_match
+        mask = bytearray(len(haystacks))
+        for i, haystack in enumerate(haystacks):
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            if start <= hlen and is_match(self._ptr, haystack, hlen, start):
+                mask[i] = 1
+        return mask
+
+    def find_many(self, haystacks, start=0):
+        """ Returns the start and end byte offsets of the leftmost-first
+        match in every haystack of the sequence haystacks, as one flat
+        array of the form ``[start0, end0, start1, end1, ...]``. Haystacks
+        without a match are reported as ``-1, -1``.
+        """
+        ffi = _native.ffi
+        find = _native.lib.rure_find
+        matches = ffi.new('rure_match[]', len(haystacks))
+        for i, haystack in enumerate(haystacks):
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            match = matches + i
+            if start > hlen or not find(self._ptr, haystack, hlen, start,
+                                        match):
+                match.start = match.end = _NO_OFFSET
+        result = array(CAPTURE_TYPECODE)
+        result.frombytes(ffi.buffer(matches))
+        return result
+
+    def map_is_match(self, haystacks, start=0, workers=None, executor=None,
+                     chunksize=None):
+        """ Parallel version of is_match_many, splitting haystacks into
+        chunks that are scanned on a thread pool.
+
+        :param workers:   Number of threads to use (default: CPU count)
+        :param executor:  Optional existing concurrent.futures executor to
+                          submit the chunks to instead of a new pool
+        :param chunksize: Number of haystacks per task
+        """
+        return bytearray().join(_map_chunks(
+            lambda chunk: self.is_match_many(chunk, start),
+            haystacks, workers, executor, chunksize))
+
+    def map_find(self, haystacks, start=0, workers=None, executor=None,
+                 chunksize=None):
+        """ Parallel version of find_many, splitting haystacks into chunks
+        that are scanned on a thread pool. See map_is_match for the
+        parameters.
+        """
+        result = array(CAPTURE_TYPECODE)
+        for offsets in _map_chunks(lambda chunk: self.find_many(chunk, start),
+                                   haystacks, workers, executor, chunksize):
+            result.extend(offsets)
+        return result
+
     @accepts_bytes
-    def find_iter(self, haystack, start=0):
-        """Returns the capture groups corresponding to the leftmost-first match
-        in text. Capture group 0 always corresponds to the entire match.
-        If no match is found, then None is returned.
+    @metrics.instrumented(lazy=True)
+    def find_iter(self, haystack, start=0, end=None):
+        """ Returns an iterator over the start and end byte ranges of the
+        successive non-overlapping matches in text, beginning at start.
 
-        You should only use captures if you need access to submatches.
-        Otherwise, find is faster for discovering the location of the overall
-        match.
+        Matches are looked up in batches of growing size, so taking only
+        the first few matches stays cheap.
         """
-        hlen = len(haystack)
-        find_iter = _native.ffi.gc(_native.lib.rure_iter_new(self._ptr),
-                           _native.lib.rure_iter_free)
+        return self._iter_matches(haystack, _search_len(haystack, end), start)
 
-        match = _native.ffi.new('rure_match *')
-        while _native.lib.rure_iter_next(find_iter,
-                                  haystack,
-                                  hlen,
-                                  match):
-            yield RureMatch(match.start, match.end)
+    def _iter_matches(self, haystack, hlen, start):
+        if not start and not self._utf8:
+            # The iterator of the C library steps over empty matches one
+            # byte at a time, as required, and only works from the start.
+            it = _native.ffi.gc(_native.lib.rure_iter_new(self._ptr),
+                                _native.lib.rure_iter_free)
+            match = _native.ffi.new('rure_match *')
+            iter_next = _native.lib.rure_iter_next
+            while iter_next(it, haystack, hlen, match):
+                yield RureMatch(match.start, match.end)
+            return
+        chunk = _native.ffi.new('rure_match[]', _MATCH_CHUNK)
+        size, last = 1, None
+        while True:
+            n, start, last = self._fill_matches(haystack, hlen, start, last,
+                                                chunk, size)
+            for i in range(n):
+                match = chunk[i]
+                yield RureMatch(match.start, match.end)
+            if n < size:
+                return
+            size = min(size * 2, _MATCH_CHUNK)
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.offsets)
+    def find_all(self, haystack, start=0, end=None, out=None, limit=0):
+        """ Returns the start and end byte offsets of every successive
+        non-overlapping match in text as one flat buffer of the form
+        ``[start0, end0, start1, end1, ...]``.
+
+        The C library writes each match directly into the output memory,
+        so no Python object is created per match. This is the bulk
+        counterpart of find_iter.
+
+        :param out: Optional writable buffer of ``size_t`` wide items (e.g.
+                    ``array(OFFSET_TYPECODE)`` or a ``numpy.uint64`` array).
+                    When given, matches are written into it from index 0
+                    and the number of matches written is returned instead.
+                    Scanning stops once ``out`` is full.
+        :param limit: Maximum number of matches to find (0 for all of them)
+        """
+        ffi = _native.ffi
+        hlen = _search_len(haystack, end)
+        if out is not None:
+            buf = ffi.from_buffer(out, require_writable=True)
+            dst = ffi.cast('rure_match *', buf)
+            capacity = len(buf) // ffi.sizeof('rure_match')
+            return self._fill_matches(haystack, hlen, start, None,
+                                      dst, min(capacity, limit or capacity))[0]
+
+        result = array(OFFSET_TYPECODE)
+        size = min(_MATCH_CHUNK, hlen + 1)
+        chunk = ffi.new('rure_match[]', size)
+        last = None
+        while True:
+            if limit:
+                size = min(size, limit - len(result) // 2)
+            n, start, last = self._fill_matches(haystack, hlen, start, last,
+                                                chunk, size)
+            result.frombytes(ffi.buffer(chunk, n * ffi.sizeof('rure_match')))
+            if n < size or limit and len(result) == 2 * limit:
+                return result
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.number)
+    def count(self, haystack, start=0, end=None):
+        """ Returns the number of successive non-overlapping matches in
+        text, i.e. the number of items find_iter would produce, without
+        creating any Python object per match.
+        """
+        hlen = _search_len(haystack, end)
+        size = min(_MATCH_CHUNK, hlen + 1)
+        chunk = _native.ffi.new('rure_match[]', size)
+        total, last = 0, None
+        while True:
+            n, start, last = self._fill_matches(haystack, hlen, start, last,
+                                                chunk, size)
+            total += n
+            if n < size:
+                return total
+
+    def _after_empty(self, haystack, hlen, end):
+        """ Returns the offset the search resumes from after an empty match
+        at end: the next byte, as rure_iter_next does, or the start of the
+        next character. Searching from inside a character could report
+        empty matches there, and makes the engine loop forever on Unicode
+        word boundaries.
+        """
+        start = end + 1
+        if self._utf8:
+            while start < hlen and indexbytes(haystack, start) & 0xC0 == 0x80:
+                start += 1
+        return start
+
+    def _fill_matches(self, haystack, hlen, start, last, dst, capacity):
+        """ Writes up to capacity successive matches into the rure_match
+        array dst, following the iteration rules of rure_iter_next.
+
+        Returns the number of matches written along with the position and
+        last match end to resume from.
+        """
+        find = _native.lib.rure_find
+        n = 0
+        while n < capacity and start <= hlen:
+            match = dst + n
+            if not find(self._ptr, haystack, hlen, start, match):
+                return n, hlen + 1, last
+            end = match.end
+            if match.start == end:
+                # Empty match: make progress by starting the next search one
+                # byte (or character) further, and skip it entirely if it
+                # immediately follows the previous match.
+                start = self._after_empty(haystack, hlen, end)
+                if end == last:
+                    continue
+            else:
+                start = end
+            last = end
+            n += 1
+        return n, start, last
+
+    def search_file(self, path, mode='lines'):
+        """ Returns an iterator over the successive non-overlapping matches
+        in the file at path. The file is memory-mapped and scanned in place
+        instead of being read into memory.
+
+        With mode='lines', each match is reported as a LineMatch of the
+        1-based line number and byte offset of the line the match starts
+        on, followed by the match offsets. Newlines are counted lazily
+        between consecutive matches, so memory use does not depend on the
+        size of the file. With mode='matches', plain RureMatch offsets are
+        reported.
+        """
+        if mode not in ('lines', 'matches'):
+            raise ValueError("mode must be 'lines' or 'matches', "
+                             "not {!r}".format(mode))
+        with open(path, 'rb') as fobj:
+            if not os.fstat(fobj.fileno()).st_size:
+                # Empty files cannot be mapped.
+                return
+            mapped = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+
+        ffi = _native.ffi
+        haystack = ffi.from_buffer(mapped)
+        try:
+            lines = _LineTracker(mapped)
+            for match in self._iter_matches(haystack, len(haystack), 0):
+                if mode == 'lines':
+                    line_number, line_start = lines.locate(match.start)
+                    yield LineMatch(line_number, line_start, *match)
+                else:
+                    yield match
+        finally:
+            ffi.release(haystack)
+            mapped.close()
+
+    def _read_captures(self, captures, match):
+        """ Returns the Captures of captures, reading each group through the
+        rure_match pointer match.
+        """
+        return self.capture_cls(*[
+            RureMatch(match.start, match.end)
+                if _native.lib.rure_captures_at(captures, i, match) else None
+            for i in range(0, _native.lib.rure_captures_len(captures))
+        ])
 
     @accepts_bytes
-    def captures(self, haystack, start=0):
+    @metrics.instrumented(metrics.found)
+    def captures(self, haystack, start=0, end=None):
         """Returns the capture groups corresponding to the leftmost-first match
         in text. Capture group 0 always corresponds to the entire match.
         If no match is found, then None is returned.
@@ -182,56 +671,312 @@ class Rure(object):
         Otherwise, find is faster for discovering the location of the overall
         match.
         """
-        hlen = len(haystack)
+        hlen = _search_len(haystack, end)
         captures = _native.ffi.gc(_native.lib.rure_captures_new(self._ptr),
                           _native.lib.rure_captures_free)
-        match = _native.ffi.new('rure_match *')
-        if _native.lib.rure_find_captures(
+        if start <= hlen and _native.lib.rure_find_captures(
             self._ptr,
             haystack,
             hlen,
             start,
             captures
         ):
-            return self.capture_cls(*[
-                RureMatch(match.start, match.end)
-                    if _native.lib.rure_captures_at(captures, i, match) else None
-                for i in range(0, _native.lib.rure_captures_len(captures))
-            ])
+            return self._read_captures(captures,
+                                       _native.ffi.new('rure_match *'))
 
     @accepts_bytes
-    def captures_iter(self, haystack, start=0):
+    @metrics.instrumented(lazy=True)
+    def captures_iter(self, haystack, start=0, end=None):
         """Returns an iterator over all the non-overlapping capture groups
-        matched in text. This is operationally the same as find_iter,
-        except it yields information about submatches.
+        matched in text, beginning at start. This is operationally the same
+        as find_iter, except it yields information about submatches.
         """
-        hlen = len(haystack)
+        hlen = _search_len(haystack, end)
         captures = _native.ffi.gc(_native.lib.rure_captures_new(self._ptr),
                           _native.lib.rure_captures_free)
-        captures_iter = _native.ffi.gc(_native.lib.rure_iter_new(self._ptr),
-                               _native.lib.rure_iter_free)
         match = _native.ffi.new('rure_match *')
-        while _native.lib.rure_iter_next_captures(captures_iter,
-                                           haystack,
-                                           hlen,
-                                           captures):
-            yield self.capture_cls(*[
-                RureMatch(match.start, match.end)
-                    if _native.lib.rure_captures_at(captures, i, match) else None
-                for i in range(0, _native.lib.rure_captures_len(captures))
-            ])
+        if not start and not self._utf8:
+            # See _iter_matches.
+            it = _native.ffi.gc(_native.lib.rure_iter_new(self._ptr),
+                                _native.lib.rure_iter_free)
+            while _native.lib.rure_iter_next_captures(it, haystack, hlen,
+                                                      captures):
+                yield self._read_captures(captures, match)
+            return
+        last = None
+        while start <= hlen:
+            if not _native.lib.rure_find_captures(self._ptr, haystack, hlen,
+                                                  start, captures):
+                return
+            _native.lib.rure_captures_at(captures, 0, match)
+            match_end = match.end
+            if match.start == match_end:
+                start = self._after_empty(haystack, hlen, match_end)
+                if match_end == last:
+                    continue
+            else:
+                start = match_end
+            last = match_end
+            yield self._read_captures(captures, match)
 
     @accepts_bytes
-    def shortest_match(self, haystack, start=0):
+    @metrics.instrumented(metrics.capture_offsets)
+    def captures_all(self, haystack, start=0, end=None, out=None, limit=0):
+        """ Returns the capture group offsets of every successive
+        non-overlapping match in text as one dense buffer of shape
+        ``(matches, groups, 2)``, flattened in row-major order. Groups that
+        did not participate in a match are reported as ``-1, -1``.
+
+        This is the bulk counterpart of captures_iter: the C library writes
+        the offsets directly into the output memory, and no Python object
+        is created per match or per group.
+
+        :param out: Optional writable buffer of signed ``size_t`` wide
+                    items (e.g. ``array(CAPTURE_TYPECODE)`` or a
+                    ``numpy.int64`` array). When given, matches are written
+                    into it from index 0 and the number of matches written
+                    is returned instead. Scanning stops once ``out`` is full.
+        :param limit: Maximum number of matches to find (0 for all of them)
+        """
+        ffi = _native.ffi
+        hlen = _search_len(haystack, end)
+        captures = ffi.gc(_native.lib.rure_captures_new(self._ptr),
+                          _native.lib.rure_captures_free)
+        groups = _native.lib.rure_captures_len(captures)
+        row_size = groups * ffi.sizeof('rure_match')
+        if out is not None:
+            buf = ffi.from_buffer(out, require_writable=True)
+            dst = ffi.cast('rure_match *', buf)
+            capacity = len(buf) // row_size
+            return self._fill_captures(haystack, hlen, start, None, captures,
+                                       groups, dst,
+                                       min(capacity, limit or capacity))[0]
+
+        result = array(CAPTURE_TYPECODE)
+        size = min(_MATCH_CHUNK, hlen + 1)
+        chunk = ffi.new('rure_match[]', size * groups)
+        last = None
+        while True:
+            if limit:
+                size = min(size, limit - len(result) // (2 * groups))
+            n, start, last = self._fill_captures(haystack, hlen, start, last,
+                                                 captures, groups, chunk, size)
+            result.frombytes(ffi.buffer(chunk, n * row_size))
+            if n < size or limit and len(result) == 2 * groups * limit:
+                return result
+
+    def _fill_captures(self, haystack, hlen, start, last, captures, groups,
+                       dst, capacity):
+        """ Writes the groups of up to capacity successive matches into the
+        rure_match array dst, one row of groups per match.
+
+        Returns the number of matches written along with the position and
+        last match end to resume from.
+        """
+        find_captures = _native.lib.rure_find_captures
+        captures_at = _native.lib.rure_captures_at
+        n = 0
+        while n < capacity and start <= hlen:
+            if not find_captures(self._ptr, haystack, hlen, start, captures):
+                return n, hlen + 1, last
+            row = dst + n * groups
+            captures_at(captures, 0, row)
+            end = row.end
+            if row.start == end:
+                start = self._after_empty(haystack, hlen, end)
+                if end == last:
+                    continue
+            else:
+                start = end
+            last = end
+            for i in range(1, groups):
+                group = row + i
+                if not captures_at(captures, i, group):
+                    group.start = group.end = _NO_OFFSET
+            n += 1
+        return n, start, last
+
+    def ais_match(self, haystack, *args, **kwargs):
+        """ Awaitable version of is_match, see rure.aio.offload. """
+        return _aio().offload(self.is_match, haystack, *args, **kwargs)
+
+    def afind(self, haystack, *args, **kwargs):
+        """ Awaitable version of find, see rure.aio.offload. """
+        return _aio().offload(self.find, haystack, *args, **kwargs)
+
+    def afind_all(self, haystack, *args, **kwargs):
+        """ Awaitable version of find_all, see rure.aio.offload. """
+        return _aio().offload(self.find_all, haystack, *args, **kwargs)
+
+    def acaptures_all(self, haystack, *args, **kwargs):
+        """ Awaitable version of captures_all, see rure.aio.offload. """
+        return _aio().offload(self.captures_all, haystack, *args, **kwargs)
+
+    def acount(self, haystack, *args, **kwargs):
+        """ Awaitable version of count, see rure.aio.offload. """
+        return _aio().offload(self.count, haystack, *args, **kwargs)
+
+    def sub(self, repl, haystack, count=0):
+        """ Returns a copy of haystack in which the first count (all of them
+        if 0) successive non-overlapping matches are replaced by repl.
+        See subn.
+        """
+        return self.subn(repl, haystack, count)[0]
+
+    def subn(self, repl, haystack, count=0):
+        """ Replaces the first count (all of them if 0) successive
+        non-overlapping matches in haystack by repl, returning a tuple of
+        the resulting byte string and the number of replacements made.
+
+        repl is either a byte string template or a callable. In a template,
+        ``$name`` and ``${name}`` are replaced by the text of the capture
+        group with that index or name (nothing if there is no such group
+        or it did not participate in the match), and ``$$`` by a literal
+        ``$``, as in the Rust regex crate. A callable is given the captures
+        of each match, as returned by captures, and returns its replacement.
+
+        The offsets of all matches (or of their capture groups, if repl
+        needs them) are collected in a single pass with find_all or
+        captures_all before the result is built, so there is no round trip
+        to the C library per match, even for callables.
+        """
+        text = haystack if isinstance(haystack, bytes) \
+            else _native.ffi.buffer(to_buffer(haystack))
+        parts = None if callable(repl) else template.parse(repl, dict(
+            (name, i) for i, name in enumerate(self.capture_names()) if name
+        ))
+
+        if parts is not None and template.is_literal(parts):
+            literal = b''.join(parts)
+            offsets = self.find_all(haystack, limit=count)
+            width = 2
+        else:
+            literal = None
+            groups = len(self.capture_cls._fields)
+            width = 2 * groups
+            offsets = self.captures_all(haystack, limit=count)
+
+        pieces = []
+        pos = 0
+        for i in range(0, len(offsets), width):
+            row = offsets[i:i + width]
+            pieces.append(text[pos:row[0]])
+            if literal is not None:
+                pieces.append(literal)
+            elif parts is not None:
+                pieces.append(template.expand(parts, text, row))
+            else:
+                pieces.append(repl(self._captures_from_row(row)))
+            pos = row[1]
+        pieces.append(text[pos:])
+        return b''.join(pieces), len(offsets) // width
+
+    def split(self, haystack, maxsplit=0):
+        """ Returns the list of byte strings of haystack separated by the
+        successive non-overlapping matches, with at most maxsplit splits
+        (all of them if 0); the remainder is returned as the last element.
+
+        All separators are located in one pass with find_all. Unlike
+        re.split, the text of capture groups is not included in the result.
+        """
+        text = haystack if isinstance(haystack, bytes) \
+            else _native.ffi.buffer(to_buffer(haystack))
+        offsets = self.find_all(haystack, limit=maxsplit)
+        pieces = []
+        pos = 0
+        for i in range(0, len(offsets), 2):
+            pieces.append(text[pos:offsets[i]])
+            pos = offsets[i + 1]
+        pieces.append(text[pos:])
+        return pieces
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.pieces, lazy=True)
+    def split_iter(self, haystack, maxsplit=0):
+        """ Returns an iterator over the pieces of haystack separated by the
+        successive non-overlapping matches, as split does, but lazily and
+        as memoryview slices of haystack rather than copies of them.
+
+        Splitting a large buffer therefore takes no more memory than the
+        buffer itself. As with any view, a bytearray or mmap haystack
+        cannot be resized or closed while slices of it are alive.
+        """
+        view = memoryview(haystack if isinstance(haystack, bytes)
+                          else _native.ffi.buffer(haystack))
+        pos = 0
+        matches = self._iter_matches(haystack, len(view), 0)
+        for i, match in enumerate(matches):
+            if maxsplit and i == maxsplit:
+                break
+            yield view[pos:match.start]
+            pos = match.end
+        yield view[pos:]
+
+    def _captures_from_row(self, row):
+        return self.capture_cls(*[
+            RureMatch(row[i], row[i + 1]) if row[i] >= 0 else None
+            for i in range(0, len(row), 2)
+        ])
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.found)
+    def shortest_match(self, haystack, start=0, end=None):
         """Returns end location if and only if re matches anywhere in
         text. The end location is the place at which the regex engine
         determined that a match exists, but may occur before the end of
-        the proper leftmost-first match.
+        the proper leftmost-first match. When start is not 0, it is the end
+        of the leftmost-first match.
+        """
+        hlen = _search_len(haystack, end)
+        if start > hlen:
+            return None
+        if start:
+            # See _rure_is_match_at; the end of the leftmost-first match is
+            # also a place at which a match is known to exist.
+            match = self.find(haystack, start, end)
+            return match.end if match else None
+        position = _native.ffi.new('size_t *')
+        if _native.lib.rure_shortest_match(self._ptr, haystack, hlen, start,
+                                           position):
+            return position[0]
+
+    def info(self):
+        """ Returns a RureInfo describing how the regex is compiled and
+        searched:
+
+        - program_size: size in bytes of the largest of the programs the
+          regex is compiled to, the one size_limit bounds, including the
+          ranges of its character classes
+        - instructions: that size in instructions, the number of
+          instructions of the program unless it has large classes
+        - captures: number of capture groups, including the whole match
+        - prefixes, suffixes: sorted tuples of the literals matches start
+          and end with, searched for before running a regex engine (empty if
+          none are worth searching for)
+        - anchored_start, anchored_end: whether matches must start or end at
+          the edges of the haystack
+        - engine: 'literal' when matches are found by searching for their
+          literals alone, 'dfa', 'dfa_anchored_reverse' (matching backwards
+          from the end of the haystack), 'dfa_suffix' (searching for the
+          suffixes first) or 'nfa'
+        - nfa_on_non_ascii: whether the DFA gives way to the slower NFA on
+          non-ASCII haystacks, because of Unicode word boundaries
+
+        The C library does not expose this information: the program size
+        is found by compiling the regex under a few dozen size limits, which
+        takes as many compilations, and the
+        other fields come from an analysis of the pattern after that of the
+        regex crate, which is approximate. Fields of patterns it cannot
+        analyze (e.g. with flags changing in the middle) are None.
         """
-        hlen = len(haystack)
-        end = _native.ffi.new('size_t *')
-        if _native.lib.rure_shortest_match(self._ptr, haystack, hlen, start, end):
-            return end[0]
+        found = _analyze(self.pattern, self.flags)
+        size = _program_size(self.pattern, self.flags)
+        return RureInfo(
+            size, size // _instruction_size(), len(self._capture_names),
+            found and found.prefixes, found and found.suffixes,
+            found and found.anchored_start, found and found.anchored_end,
+            _engine(found, self.options.get('dfa_size_limit') != 0),
+            found and found.unicode_word_boundary)
 
 
 class RureSet(object):
@@ -244,6 +989,14 @@ class RureSet(object):
     touch more power: it will also report which regular expressions in the set
     match. Indeed, this is the key difference between regex sets and a single
     Regex with many alternates, since only one alternate can match at a time.
+
+    Like Rure, it searches byte strings and contiguous buffers in place.
+
+    Large sets are split into shards, each compiled as a separate regex set,
+    when their program exceeds size_limit or the number of regexes exceeds
+    shard_size. The shards are searched in turn, or in parallel for large
+    haystacks, and are presented as a single set: indices always refer to
+    the position of a regex in the whole set.
     """
     def __init__(self, *res, **options):
 
@@ -253,15 +1006,22 @@ class RureSet(object):
         :param res:     List of Bytestring expressions to compile
         :param kwargs:  Config options to pass (flags bitmask,
                                                 size_limit,
-                                                dfa_size_limit)
+                                                dfa_size_limit,
+                                                shard_size: maximum number
+                                                of regexes per shard,
+                                                workers: number of threads
+                                                searching shards in
+                                                parallel,
+                                                name: label of the set in
+                                                rure.metrics)
         """
 
         flags = options.pop('flags', DEFAULT_FLAGS)
-        if not all(isinstance(re, bytes) for re in res):
-            raise TypeError("'rure.lib.RureSet' must be instantiated with a "
-                            "list of bytestrings as first argument.")
+        self.shard_size = options.pop('shard_size', None)
+        self.name = options.pop('name', None)
+        self.workers = options.pop('workers', None)
+        self._check_patterns(res)
 
-        self._err = _native.ffi.gc(_native.lib.rure_error_new(), _native.lib.rure_error_free)
         self._opts = _native.ffi.gc(_native.lib.rure_options_new(), _native.lib.rure_options_free)
         self.options = options
         if 'size_limit' in options:
@@ -270,52 +1030,453 @@ class RureSet(object):
             _native.lib.rure_options_dfa_size_limit(self._opts,
                                              options['dfa_size_limit'])
 
+        self.patterns = list(res)
+        self.flags = flags
+        # Rure objects for the individual patterns, compiled on first use.
+        self._res = [None] * len(res)
+        self._executor = None
+        self._shards = self._compile_shards(self.patterns, 0)
+        # See metrics_label.
+        self._label = None
+
+    @staticmethod
+    def _check_patterns(res):
+        if not all(isinstance(re, bytes) for re in res):
+            raise TypeError("'rure.lib.RureSet' must be instantiated with a "
+                            "list of bytestrings as first argument.")
+
+    def _compile_shards(self, res, offset):
+        """ Compiles the regexes res, the first of which is at index offset
+        in the set, into a list of shards of at most shard_size regexes.
+        """
+        size = self.shard_size or max(len(res), 1)
+        shards = []
+        for i in range(0, len(res), size):
+            shards.extend(self._compile_shard(res[i:i + size], offset + i))
+        return shards
+
+    def _compile_shard(self, res, offset):
+        """ Compiles the regexes res into a shard, or into several shards by
+        repeatedly halving res if their program exceeds the size limit.
+        """
         patterns = []
         patterns_lengths = []
         for re in res:
             patterns.append(_native.ffi.new("uint8_t []", re))
             patterns_lengths.append(len(re))
 
-        s = checked_call(
-            _native.lib.rure_compile_set,
-            self._err,
-            _native.ffi.new("uint8_t *[]", patterns),
-            _native.ffi.new("size_t []", patterns_lengths),
-            len(patterns),
-            flags,
-            self._opts)
-        self._ptr = _native.ffi.gc(s, _native.lib.rure_set_free)
+        # The error is left as is by a successful compilation, so each
+        # attempt needs a fresh one.
+        err = _native.ffi.gc(_native.lib.rure_error_new(),
+                             _native.lib.rure_error_free)
+        try:
+            s = checked_call(
+                _native.lib.rure_compile_set,
+                err,
+                _native.ffi.new("uint8_t *[]", patterns),
+                _native.ffi.new("size_t []", patterns_lengths),
+                len(patterns),
+                self.flags,
+                self._opts)
+        except exceptions.CompiledTooBigError:
+            if len(res) == 1:
+                raise
+            half = len(res) // 2
+            return (self._compile_shard(res[:half], offset) +
+                    self._compile_shard(res[half:], offset + half))
+        return [_SetShard(offset, len(res),
+                          _native.ffi.gc(s, _native.lib.rure_set_free))]
+
+    def metrics_label(self):
+        """
+        Returns the text identifying the set in rure.metrics: its name if
+        given, and otherwise its first pattern and size along with a digest
+        of all of its patterns, so that different sets are recorded apart.
+        """
+        if self.name is not None:
+            return self.name
+        if self._label is None:
+            if len(self.patterns) == 1:
+                self._label = self.patterns[0].decode('utf8', 'replace')
+            else:
+                digest = hashlib.sha1()
+                for re in self.patterns:
+                    digest.update(str(len(re)).encode('ascii') + b':' + re)
+                self._label = u"{}|... ({} patterns, {})".format(
+                    self.patterns[0].decode('utf8', 'replace')
+                    if self.patterns else u'',
+                    len(self.patterns), digest.hexdigest()[:12])
+        return self._label
 
     def __len__(self):
-        return _native.lib.rure_set_len(self._ptr)
+        return len(self.patterns)
+
+    def __getitem__(self, index):
+        return self.patterns[index]
+
+    def __setitem__(self, index, re):
+        """
+        Replaces the regex at index, recompiling only the shard holding it.
+        """
+        self._check_patterns([re])
+        index = range(len(self))[index]
+        for i, shard in enumerate(self._shards):
+            if index < shard.offset + shard.size:
+                break
+        res = self.patterns[shard.offset:shard.offset + shard.size]
+        res[index - shard.offset] = re
+        self._shards[i:i + 1] = self._compile_shards(res, shard.offset)
+        self.patterns[index] = re
+        self._res[index] = None
+        self._label = None
+
+    def append(self, re):
+        """
+        Adds the regex re at the end of the set. See extend.
+        """
+        self.extend([re])
+
+    def extend(self, res):
+        """
+        Adds the regexes res at the end of the set. They go into the last
+        shard, which is split only if its program exceeds size_limit, or, if
+        it has no room left under shard_size, into new shards. Other existing
+        shards are not recompiled.
+        """
+        res = list(res)
+        self._check_patterns(res)
+        shards = self._shards
+        keep = len(shards)
+        if shards and (not self.shard_size or
+                       shards[-1].size < self.shard_size):
+            keep -= 1
+        offset = shards[keep].offset if keep < len(shards) else len(self)
+        shards[keep:] = self._compile_shards(self.patterns[offset:] + res,
+                                             offset)
+        self.patterns.extend(res)
+        self._res.extend([None] * len(res))
+        self._label = None
+
+    def _parallel(self, hlen):
+        """ Returns the executor searching shards in parallel, or None if
+        the haystack is too short for this to pay off.
+        """
+        if len(self._shards) < 2 or hlen < _PARALLEL_SCAN or \
+                self.workers == 1:
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers or multiprocessing.cpu_count())
+        return self._executor
+
+    def _is_match(self, haystack, hlen, start):
+        is_match = _rure_set_is_match_at if start \
+            else _native.lib.rure_set_is_match
+        shards = self._shards
+        if len(shards) == 1:
+            return is_match(shards[0].ptr, haystack, hlen, start)
+        executor = self._parallel(hlen)
+        if executor is not None:
+            return any(executor.map(
+                lambda shard: is_match(shard.ptr, haystack, hlen, start),
+                shards))
+        return any(is_match(shard.ptr, haystack, hlen, start)
+                   for shard in shards)
+
+    def _set_matches(self, haystack, hlen, start, matches):
+        """ Sets the items of the C bool array matches for the regexes of
+        all shards that match, returning true if any did.
+        """
+        set_matches = _native.lib.rure_set_matches
+        shards = self._shards
+        if len(shards) == 1:
+            return set_matches(shards[0].ptr, haystack, hlen, start, matches)
+        executor = self._parallel(hlen)
+        if executor is not None:
+            return any(list(executor.map(
+                lambda shard: set_matches(shard.ptr, haystack, hlen, start,
+                                          matches + shard.offset),
+                shards)))
+        matched = False
+        for shard in shards:
+            if set_matches(shard.ptr, haystack, hlen, start,
+                           matches + shard.offset):
+                matched = True
+        return matched
 
     @accepts_bytes
-    def is_match(self, haystack, start=0):
+    @metrics.instrumented(metrics.found)
+    def is_match(self, haystack, start=0, end=None):
         """
         Returns true if and only if one of the regexs matches the string
-        given.
+        given, within the window of byte offsets start to end (see
+        Rure.is_match).
 
         It is recommended to use this method if all you need to do is test
         a match, since the underlying matching engine may be able to do less
         work.
         """
-        return bool(_native.lib.rure_set_is_match(
-            self._ptr,
-            haystack,
-            len(haystack),
-            start
-        ))
+        hlen = _search_len(haystack, end)
+        return start <= hlen and self._is_match(haystack, hlen, start)
 
     @accepts_bytes
-    def matches(self, haystack, start=0):
+    @metrics.instrumented(metrics.flagged)
+    def matches(self, haystack, start=0, end=None):
         """
         Returns a list of booleans indicating whether the regex at each index
         was matched in the string given
         """
+        hlen = _search_len(haystack, end)
         matches = _native.ffi.new("bool[]", len(self))
-        _native.lib.rure_set_matches(self._ptr,
-                              haystack,
-                              len(haystack),
-                              start,
-                              matches)
+        if start <= hlen:
+            self._set_matches(haystack, hlen, start, matches)
         return [bool(match) for match in matches]
+
+    def regex(self, index):
+        """
+        Returns the compiled Rure for the regex at index in the set, which
+        is compiled with the same flags and options on first use.
+        """
+        re = self._res[index]
+        if re is None:
+            re = self._res[index] = Rure(self.patterns[index],
+                                         flags=self.flags, **self.options)
+        return re
+
+    def info(self):
+        """
+        Returns a RureInfo describing the set as Rure.info does, summing the
+        program sizes of all shards. captures is None, and prefixes are those
+        of all regexes, if each has some and none is anchored. The engine of
+        sets of more than one regex is 'dfa_many', or 'nfa'.
+        """
+        size = sum(_program_size(self.patterns[shard.offset:
+                                               shard.offset + shard.size],
+                                 self.flags)
+                   for shard in self._shards)
+        found = [_analyze(re, self.flags) for re in self.patterns]
+        dfa = self.options.get('dfa_size_limit') != 0
+        if len(found) == 1:
+            engine = _engine(found[0], dfa)
+        else:
+            engine = 'dfa_many' if dfa else 'nfa'
+        if None in found:
+            return RureInfo(size, size // _instruction_size(), None, None,
+                            None, None, None, engine, None)
+
+        def union(name):
+            if any(found_re.anchored_start or found_re.anchored_end or
+                   not getattr(found_re, name) for found_re in found):
+                return ()
+            union = sorted(set(literal for found_re in found
+                               for literal in getattr(found_re, name)))
+            if sum(len(literal) for literal in union) > literals.LIMIT_SIZE:
+                return ()
+            return tuple(union)
+
+        return RureInfo(
+            size, size // _instruction_size(), None,
+            union('prefixes'), union('suffixes'),
+            all(found_re.anchored_start for found_re in found),
+            all(found_re.anchored_end for found_re in found), engine,
+            any(found_re.unicode_word_boundary for found_re in found))
+
+    def _matched_indices(self, haystack, start, end):
+        hlen = _search_len(haystack, end)
+        matches = _native.ffi.new("bool[]", len(self))
+        if start > hlen or not self._set_matches(haystack, hlen, start,
+                                                 matches):
+            return []
+        return list(_flag_indices(_native.ffi.buffer(matches)[:]))
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.length)
+    def find_matches(self, haystack, start=0, end=None):
+        """
+        Returns the successive non-overlapping matches of every regex in
+        the set, as a list of ``SetMatch(index, start, end)`` ordered by
+        start offset and then by index. Matches of different regexes may
+        overlap.
+
+        The set is run first as a prefilter; only the regexes it reports as
+        matching are then searched for their locations, each compiled on
+        first use (see regex).
+        """
+        found = []
+        for index in self._matched_indices(haystack, start, end):
+            offsets = self.regex(index).find_all(haystack, start, end)
+            found.extend(SetMatch(index, offsets[i], offsets[i + 1])
+                         for i in range(0, len(offsets), 2))
+        found.sort(key=lambda match: (match.start, match.index))
+        return found
+
+    @accepts_bytes
+    @metrics.instrumented(metrics.length)
+    def captures_matches(self, haystack, start=0, end=None):
+        """
+        Like find_matches, but returns a list of
+        ``SetCaptures(index, start, end, captures)``, where captures are
+        those of the match as returned by Rure.captures.
+        """
+        found = []
+        for index in self._matched_indices(haystack, start, end):
+            for captures in self.regex(index).captures_iter(haystack, start,
+                                                             end):
+                found.append(SetCaptures(index, captures[0].start,
+                                         captures[0].end, captures))
+        found.sort(key=lambda match: (match.start, match.index))
+        return found
+
+    def ais_match(self, haystack, *args, **kwargs):
+        """ Awaitable version of is_match, see rure.aio.offload. """
+        return _aio().offload(self.is_match, haystack, *args, **kwargs)
+
+    def amatches(self, haystack, *args, **kwargs):
+        """ Awaitable version of matches, see rure.aio.offload. """
+        return _aio().offload(self.matches, haystack, *args, **kwargs)
+
+    def afind_matches(self, haystack, *args, **kwargs):
+        """ Awaitable version of find_matches, see rure.aio.offload. """
+        return _aio().offload(self.find_matches, haystack, *args, **kwargs)
+
+    def is_match_many(self, haystacks, start=0):
+        """
+        Tests every haystack in the sequence haystacks, returning a
+        bytearray holding 1 for each haystack matched by any regex in the
+        set and 0 for the others.
+        """
+        mask = bytearray(len(haystacks))
+        for i, haystack in enumerate(haystacks):
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            if start <= hlen and self._is_match(haystack, hlen, start):
+                mask[i] = 1
+        return mask
+
+    def matches_many(self, haystacks, start=0):
+        """
+        Returns a bytearray of ``len(haystacks) * len(self)`` items, holding
+        one row per haystack in which the item at each index is 1 if the
+        regex at that index matched and 0 otherwise.
+        """
+        ffi = _native.ffi
+        width = len(self)
+        matches = ffi.new("bool[]", len(haystacks) * width)
+        for i, haystack in enumerate(haystacks):
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            if start <= hlen:
+                self._set_matches(haystack, hlen, start, matches + i * width)
+        return bytearray(ffi.buffer(matches))
+
+    def matches_sparse(self, haystacks, start=0):
+        """
+        Returns the matches of every haystack in the iterable haystacks as
+        a sparse boolean matrix in compressed sparse row (CSR) form: a pair
+        of arrays ``(indptr, indices)`` such that the indices of the regexes
+        that matched haystack i are ``indices[indptr[i]:indptr[i + 1]]``, in
+        increasing order. Both arrays hold ``size_t`` wide items, and can be
+        handed to e.g. ``scipy.sparse.csr_matrix`` without conversion.
+
+        The result takes memory proportional to the number of hits. The C
+        library reports the matches of each haystack in a row of len(self)
+        flags, however, which is reused across haystacks but copied and
+        scanned for set flags at C speed for every haystack that matches:
+        this costs O(len(self)) per haystack, beside the search itself, and
+        O(hits) in Python.
+        """
+        ffi = _native.ffi
+        indptr = array(OFFSET_TYPECODE, [0])
+        indices = array(OFFSET_TYPECODE)
+        matches = ffi.new("bool[]", len(self))
+        flags = ffi.buffer(matches)
+        for haystack in haystacks:
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            if start <= hlen and self._set_matches(haystack, hlen, start,
+                                                   matches):
+                for i in _flag_indices(flags[:]):
+                    indices.append(i)
+                    matches[i] = False
+            indptr.append(len(indices))
+        return indptr, indices
+
+    def count_per_pattern(self, haystacks, start=0):
+        """
+        Returns an array holding, for the regex at each index, the number of
+        haystacks it matched. haystacks is either a single haystack, giving
+        counts of 0 or 1, or a sequence of haystacks.
+
+        Only the counts of the patterns that matched are updated for each
+        haystack. The C library reports them in a row of len(self) flags,
+        however, which is copied and scanned for set flags at C speed for
+        every haystack that matches: this costs O(len(self)) per haystack,
+        beside the search itself, and O(hits) in Python.
+        """
+        if isinstance(haystacks, bytes):
+            haystacks = [haystacks]
+        else:
+            try:
+                memoryview(haystacks)
+            except TypeError:
+                pass
+            else:
+                haystacks = [haystacks]
+
+        ffi = _native.ffi
+        counts = array(OFFSET_TYPECODE, [0]) * len(self)
+        matches = ffi.new("bool[]", len(self))
+        flags = ffi.buffer(matches)
+        for haystack in haystacks:
+            if not isinstance(haystack, bytes):
+                haystack = to_buffer(haystack)
+            hlen = len(haystack)
+            if start > hlen or not self._set_matches(haystack, hlen, start,
+                                                     matches):
+                continue
+            for i in _flag_indices(flags[:]):
+                counts[i] += 1
+                matches[i] = False
+        return counts
+
+    def map_is_match(self, haystacks, start=0, workers=None, executor=None,
+                     chunksize=None):
+        """
+        Parallel version of is_match_many, splitting haystacks into chunks
+        that are scanned on a thread pool. See Rure.map_is_match for the
+        parameters.
+        """
+        return bytearray().join(_map_chunks(
+            lambda chunk: self.is_match_many(chunk, start),
+            haystacks, workers, executor, chunksize))
+
+    def map_matches(self, haystacks, start=0, workers=None, executor=None,
+                    chunksize=None):
+        """
+        Parallel version of matches_many, splitting haystacks into chunks
+        that are scanned on a thread pool. See Rure.map_is_match for the
+        parameters.
+        """
+        return bytearray().join(_map_chunks(
+            lambda chunk: self.matches_many(chunk, start),
+            haystacks, workers, executor, chunksize))
+
+    def map_matches_sparse(self, haystacks, start=0, workers=None,
+                           executor=None, chunksize=None):
+        """
+        Parallel version of matches_sparse, splitting haystacks into chunks
+        that are scanned on a thread pool. See Rure.map_is_match for the
+        parameters.
+        """
+        indptr = array(OFFSET_TYPECODE, [0])
+        indices = array(OFFSET_TYPECODE)
+        for chunk_indptr, chunk_indices in _map_chunks(
+                lambda chunk: self.matches_sparse(chunk, start),
+                haystacks, workers, executor, chunksize):
+            base = len(indices)
+            indptr.extend(base + n for n in chunk_indptr[1:])
+            indices.extend(chunk_indices)
+        return indptr, indices
@@ -0,0 +1,274 @@
+""" Approximate literal analysis of patterns, after the literal extraction
+the regex crate uses to choose a matching engine.
+
+The C library does not expose its analysis, so patterns are parsed again
+here with the parser of the re module, once the syntax re lacks has been
+translated (Unicode classes, \\z, \\x{...}, flags such as U). Patterns it
+still cannot parse are reported as unknown rather than guessed at.
+"""
+import re
+import warnings
+from collections import namedtuple
+
+from six import unichr
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+# Limits on extracted literals, as in regex-syntax: the total number of
+# bytes in a set of literals, and the number of characters a class may be
+# expanded to.
+LIMIT_SIZE = 250
+LIMIT_CLASS = 10
+
+Literals = namedtuple("Literals", ("prefixes", "suffixes", "complete",
+                                   "anchored_start", "anchored_end",
+                                   "unicode_word_boundary"))
+
+_RUST_ONLY = re.compile(
+    r'\\\\|'
+    r'(?P<unicode>\\[pP](?:\{[^}]*\}|\w))|'
+    r'(?P<posix>\[:\^?[a-z]+:\])|'
+    r'(?P<hex>\\x\{(?P<code>[0-9a-fA-F]+)\})|'
+    r'(?P<end>\\z)|'
+    r'(?P<flags>\(\?(?P<letters>[imsUux-]*)(?P<close>[:)]))')
+
+# A flag group turning Unicode off, which makes \\b an ASCII boundary.
+_NO_UNICODE = re.compile(br'\(\?[a-zA-Z]*-[a-zA-Z]*u')
+
+_START_ANCHORS = (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING)
+_END_ANCHORS = (sre_parse.AT_END, sre_parse.AT_END_STRING)
+_LINE_ANCHORS = (sre_parse.AT_BEGINNING, sre_parse.AT_END)
+_BOUNDARIES = (sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY)
+
+
+def _translate(match):
+    if match.group('unicode') or match.group('posix'):
+        return r'\w'
+    if match.group('hex'):
+        char = int(match.group('code'), 16)
+        return re.escape(unichr(char))
+    if match.group('end'):
+        return r'\Z'
+    if match.group('flags'):
+        # re has no U (swap greed) flag, and u is the default.
+        letters = match.group('letters').replace('U', '').replace('u', '')
+        if letters.endswith('-'):
+            letters = letters[:-1]
+        if not letters:
+            return '(?:' if match.group('close') == ':' else ''
+        return '(?' + letters + match.group('close')
+    return match.group()
+
+
+def _class_operations(text):
+    """ Returns true if text has character classes that sre_parse would
+    misread: nested classes, or the set operations &&, -- and ~~.
+    """
+    i, size = 0, len(text)
+    in_class = False
+    while i < size:
+        char = text[i]
+        if char == '\\':
+            i += 2
+            continue
+        if not in_class:
+            if char == '[':
+                in_class = True
+                i += 1
+                if text.startswith('^', i):
+                    i += 1
+                if text.startswith(']', i):
+                    # A leading ] is a literal.
+                    i += 1
+                continue
+        elif text.startswith('[:', i) and ':]' in text[i + 2:]:
+            i = text.index(':]', i + 2) + 2
+            continue
+        elif char == '[' or text[i:i + 2] in ('&&', '--', '~~'):
+            return True
+        elif char == ']':
+            in_class = False
+        i += 1
+    return False
+
+
+def _parse(pattern):
+    try:
+        text = pattern.decode('utf8')
+        if _class_operations(text):
+            return None
+        with warnings.catch_warnings():
+            # e.g. FutureWarning on possible set operations.
+            warnings.simplefilter('ignore')
+            return sre_parse.parse(_RUST_ONLY.sub(_translate, text))
+    except Exception:
+        return None
+
+
+class _Extractor(object):
+    """ Extracts the literals that matches of a parsed pattern start (or,
+    if reverse, end) with.
+    """
+
+    def __init__(self, multiline, reverse):
+        self.multiline = multiline
+        self.reverse = reverse
+
+    def sequence(self, items, icase):
+        """ Returns the set of literals of a sequence of nodes, and whether
+        it is complete, i.e. the sequence matches exactly these literals.
+        """
+        literals, complete = set([u'']), True
+        for op, av in (reversed(items) if self.reverse else items):
+            node = self.node(op, av, icase)
+            if node is None:
+                return literals, False
+            alternatives, node_complete = node
+            joined = set(b + a if self.reverse else a + b
+                         for a in literals for b in alternatives)
+            if sum(len(literal.encode('utf8'))
+                   for literal in joined) > LIMIT_SIZE:
+                return literals, False
+            literals = joined
+            if not node_complete:
+                return literals, False
+        return literals, complete
+
+    def node(self, op, av, icase):
+        if op is sre_parse.LITERAL:
+            char = unichr(av)
+            if icase and char.lower() != char.upper():
+                return set([char.lower(), char.upper()]), True
+            return set([char]), True
+        if op is sre_parse.IN:
+            return self.char_class(av, icase)
+        if op is sre_parse.SUBPATTERN:
+            if len(av) == 4:
+                add_flags, del_flags = av[1], av[2]
+                if add_flags & sre_parse.SRE_FLAG_IGNORECASE:
+                    icase = True
+                if del_flags & sre_parse.SRE_FLAG_IGNORECASE:
+                    icase = False
+            return self.sequence(av[-1], icase)
+        if op is sre_parse.BRANCH:
+            literals, complete = set(), True
+            for branch in av[1]:
+                branch_literals, branch_complete = self.sequence(branch,
+                                                                 icase)
+                if u'' in branch_literals:
+                    return None
+                literals |= branch_literals
+                complete = complete and branch_complete
+            return literals, complete
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, items = av
+            if low == 0:
+                return None
+            literals, complete = self.sequence(items, icase)
+            if u'' in literals:
+                return None
+            return literals, complete and low == high == 1
+        if op is sre_parse.AT:
+            if av in _BOUNDARIES:
+                return None
+            if self.multiline and av in _LINE_ANCHORS:
+                return None
+            return set([u'']), True
+        return None
+
+    def char_class(self, items, icase):
+        chars = set()
+        for op, av in items:
+            if op is sre_parse.LITERAL:
+                chars.add(unichr(av))
+            elif op is sre_parse.RANGE and av[1] - av[0] < LIMIT_CLASS:
+                chars.update(unichr(c) for c in range(av[0], av[1] + 1))
+            else:
+                return None
+        if icase:
+            chars = set(case for char in chars
+                        for case in (char.lower(), char.upper()))
+        if not chars or len(chars) > LIMIT_CLASS:
+            return None
+        return chars, True
+
+
+def _anchored(items, multiline, start, every=all):
+    """ Returns true if every match (or, if every is any, some match) of
+    the sequence of nodes items starts (or, unless start, ends) at an edge
+    of the text.
+    """
+    if not items:
+        return False
+    op, av = items[0] if start else items[-1]
+    if op is sre_parse.AT:
+        anchors = _START_ANCHORS if start else _END_ANCHORS
+        return av in anchors and not (multiline and av in _LINE_ANCHORS)
+    if op is sre_parse.SUBPATTERN:
+        return _anchored(av[-1], multiline, start, every)
+    if op is sre_parse.BRANCH:
+        return every(_anchored(branch, multiline, start, every)
+                     for branch in av[1])
+    return False
+
+
+def _has_boundary(items):
+    for op, av in items:
+        if op is sre_parse.AT and av in _BOUNDARIES:
+            return True
+        if op in (sre_parse.SUBPATTERN, sre_parse.MAX_REPEAT,
+                  sre_parse.MIN_REPEAT) and _has_boundary(av[-1]):
+            return True
+        if op is sre_parse.BRANCH and any(_has_boundary(branch)
+                                          for branch in av[1]):
+            return True
+    return False
+
+
+def _flags(parsed):
+    state = getattr(parsed, 'state', None) or getattr(parsed, 'pattern')
+    return state.flags
+
+
+def analyze(pattern, icase=False, multiline=False, unicode=True):
+    """ Returns the Literals of the byte string pattern: the literals its
+    matches start and end with, as sorted tuples of byte strings (empty if
+    there are none worth searching for), whether the prefixes are the
+    complete matches, whether it is anchored at the start and end of text,
+    and whether it uses Unicode word boundaries, which the lazy DFA cannot
+    handle on non-ASCII text.
+
+    Returns None if the pattern cannot be analyzed.
+    """
+    parsed = _parse(pattern)
+    if parsed is None:
+        return None
+    flags = _flags(parsed)
+    icase = icase or bool(flags & sre_parse.SRE_FLAG_IGNORECASE)
+    multiline = multiline or bool(flags & sre_parse.SRE_FLAG_MULTILINE)
+    items = list(parsed)
+
+    anchored_start = _anchored(items, multiline, True)
+    anchored_end = _anchored(items, multiline, False)
+    found = []
+    for reverse in (False, True):
+        anchored = anchored_end if reverse else anchored_start
+        if not anchored and _anchored(items, multiline, not reverse, any):
+            # Literals of partially anchored patterns are not used.
+            found.append(((), False))
+            continue
+        extractor = _Extractor(multiline, reverse)
+        literals, complete = extractor.sequence(items, icase)
+        if u'' in literals:
+            literals, complete = set(), False
+        found.append((tuple(sorted(literal.encode('utf8')
+                                   for literal in literals)), complete))
+    (prefixes, complete), (suffixes, _) = found
+    return Literals(prefixes, suffixes, complete, anchored_start,
+                    anchored_end,
+                    unicode and not _NO_UNICODE.search(pattern) and
+                    _has_boundary(items))
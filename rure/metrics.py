@@ -0,0 +1,307 @@
+""" Opt-in instrumentation of the search methods of Rure, RureSet and
+RegexObject.
+
+While enabled, every call records, for its pattern and method, the number
+of calls, the length of the haystacks searched (in bytes, or in characters
+for RegexObject), the number of matches found and a histogram of call
+latencies. Calls slower than a threshold can be reported to a hook. When
+disabled, the default, the cost of a call is that of one extra function
+call and test.
+
+Only the outermost instrumented call is recorded: a RegexObject.search is
+not also counted as the Rure.find it runs. Iterators such as find_iter are
+recorded once exhausted or discarded, with the time spent producing their
+items. sub, subn and the batch methods are recorded as the searches they
+run, if any.
+"""
+import logging
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from functools import wraps
+from timeit import default_timer
+
+from six import integer_types
+
+
+# Upper bounds, in seconds, of the buckets of latency histograms.
+DEFAULT_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 0.1, 1.0, 10.0)
+
+SlowCall = namedtuple("SlowCall", ("pattern", "method", "length", "seconds"))
+
+_log = logging.getLogger(__name__)
+# The Registry in use, or None when disabled.
+_registry = None
+# Tracks instrumented calls in progress on each thread.
+_local = threading.local()
+
+
+def _log_slow_call(call):
+    _log.warning("slow %s on %d: %.6fs for %r", call.method, call.length,
+                 call.seconds, call.pattern)
+
+
+def _label(obj):
+    """ Returns the text identifying the pattern of obj in metrics. """
+    pattern = getattr(obj, 'pattern', None)
+    if pattern is not None:
+        return pattern.decode('utf8', 'replace')
+    return obj.metrics_label()
+
+
+def _escape(value):
+    return value.replace(u'\\', u'\\\\').replace(u'"', u'\\"') \
+        .replace(u'\n', u'\\n')
+
+
+def _bound(bound):
+    return repr(float(bound))
+
+
+class _Series(object):
+    __slots__ = ('calls', 'length', 'matches', 'seconds', 'buckets')
+
+    def __init__(self, size):
+        self.calls = self.length = self.matches = 0
+        self.seconds = 0.0
+        # Non-cumulative counts per bucket, the last one for +Inf.
+        self.buckets = [0] * (size + 1)
+
+
+class Registry(object):
+    """ Holds the metrics recorded while instrumentation is enabled, keyed
+    on pattern and method (e.g. ``Rure.find``).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, slow_threshold=None,
+                 on_slow=None):
+        """
+        :param buckets:        Increasing upper bounds, in seconds, of the
+                               latency histogram buckets
+        :param slow_threshold: Duration in seconds from which calls are
+                               reported to on_slow (None to report none)
+        :param on_slow:        Callable given a SlowCall (pattern, method,
+                               length, seconds) for each slow call (default:
+                               log a warning to the rure.metrics logger)
+        """
+        self.buckets = tuple(buckets)
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow or _log_slow_call
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, pattern, method, length, matches, seconds):
+        """ Records a call of method over a haystack of the given length,
+        which found matches matches (None if unknown) in seconds.
+        """
+        key = (pattern, method)
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.calls += 1
+            series.length += length
+            if matches:
+                series.matches += matches
+            series.seconds += seconds
+            series.buckets[bucket] += 1
+        if self.slow_threshold is not None and \
+                seconds >= self.slow_threshold:
+            self.on_slow(SlowCall(pattern, method, length, seconds))
+
+    def reset(self):
+        """ Discards all metrics recorded so far. """
+        with self._lock:
+            self._series.clear()
+
+    def _cumulative(self, series):
+        counts = []
+        total = 0
+        for count in series.buckets:
+            total += count
+            counts.append(total)
+        return counts
+
+    def as_dict(self):
+        """ Returns the metrics as a dict of the form ``{pattern: {method:
+        {"calls": ..., "length": ..., "matches": ..., "seconds": ...,
+        "histogram": {bound: count}}}}``, where histogram counts are
+        cumulative, as in the text exposition, and bounds are strings
+        ending with ``"+Inf"``. The result can be serialized to JSON.
+        """
+        with self._lock:
+            items = [(key, series, self._cumulative(series))
+                     for key, series in self._series.items()]
+        bounds = [_bound(bound) for bound in self.buckets] + ['+Inf']
+        result = {}
+        for (pattern, method), series, counts in items:
+            result.setdefault(pattern, {})[method] = {
+                'calls': series.calls,
+                'length': series.length,
+                'matches': series.matches,
+                'seconds': series.seconds,
+                'histogram': dict(zip(bounds, counts)),
+            }
+        return result
+
+    def exposition(self):
+        """ Returns the metrics in the Prometheus text exposition format. """
+        with self._lock:
+            items = sorted(((key, series, self._cumulative(series))
+                            for key, series in self._series.items()),
+                           key=lambda item: item[0])
+        bounds = [_bound(bound) for bound in self.buckets] + ['+Inf']
+        lines = []
+        for name, kind, help_text, value in (
+                ('rure_calls_total', 'counter', 'Number of calls.',
+                 lambda series: series.calls),
+                ('rure_scanned_total', 'counter',
+                 'Length of the haystacks searched.',
+                 lambda series: series.length),
+                ('rure_matches_total', 'counter', 'Number of matches found.',
+                 lambda series: series.matches)):
+            lines.append(u'# HELP {} {}'.format(name, help_text))
+            lines.append(u'# TYPE {} {}'.format(name, kind))
+            for (pattern, method), series, _ in items:
+                lines.append(u'{}{{pattern="{}",method="{}"}} {}'.format(
+                    name, _escape(pattern), method, value(series)))
+        name = 'rure_call_seconds'
+        lines.append(u'# HELP {} Duration of calls.'.format(name))
+        lines.append(u'# TYPE {} histogram'.format(name))
+        for (pattern, method), series, counts in items:
+            labels = u'pattern="{}",method="{}"'.format(_escape(pattern),
+                                                        method)
+            for bound, count in zip(bounds, counts):
+                lines.append(u'{}_bucket{{{},le="{}"}} {}'.format(
+                    name, labels, bound, count))
+            lines.append(u'{}_sum{{{}}} {!r}'.format(name, labels,
+                                                     series.seconds))
+            lines.append(u'{}_count{{{}}} {}'.format(name, labels,
+                                                     series.calls))
+        return u'\n'.join(lines) + u'\n'
+
+
+def enable(buckets=DEFAULT_BUCKETS, slow_threshold=None, on_slow=None):
+    """ Starts recording metrics into a new Registry, which is returned.
+    See Registry for the parameters.
+    """
+    global _registry
+    _registry = Registry(buckets, slow_threshold, on_slow)
+    return _registry
+
+
+def disable():
+    """ Stops recording metrics, returning the Registry they were recorded
+    into, if any.
+    """
+    global _registry
+    registry, _registry = _registry, None
+    return registry
+
+
+def get_registry():
+    """ Returns the Registry metrics are recorded into, or None if
+    instrumentation is disabled.
+    """
+    return _registry
+
+
+def found(obj, result):
+    """ Match count of methods returning a match or None, or a boolean. """
+    return 0 if result is None or result is False else 1
+
+
+def number(obj, result):
+    """ Match count of methods returning it. """
+    return result
+
+
+def length(obj, result):
+    """ Match count of methods returning a list of matches. """
+    return len(result)
+
+
+def flagged(obj, result):
+    """ Match count of methods returning a boolean per regex of a set. """
+    return sum(result)
+
+
+def offsets(obj, result):
+    """ Match count of Rure.find_all, returning offsets or a number. """
+    return result if isinstance(result, integer_types) else len(result) // 2
+
+
+def capture_offsets(obj, result):
+    """ Match count of Rure.captures_all, returning offsets or a number. """
+    if isinstance(result, integer_types):
+        return result
+    return len(result) // (2 * len(obj.capture_cls._fields))
+
+
+def pieces(obj, count):
+    """ Match count of split_iter, given the number of pieces yielded. """
+    return count - 1
+
+
+def _iterate(registry, obj, method, size, iterator, seconds, matches):
+    """ Yields the items of iterator, recording the call that returned it,
+    which took seconds, once it is exhausted or discarded.
+    """
+    count = 0
+    try:
+        while True:
+            started = default_timer()
+            # Items may be consumed within another instrumented call.
+            active = getattr(_local, 'active', False)
+            _local.active = True
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _local.active = active
+                seconds += default_timer() - started
+            count += 1
+            yield item
+    finally:
+        registry.record(_label(obj), method, size,
+                        matches(obj, count) if matches else count, seconds)
+
+
+def instrumented(matches=None, lazy=False):
+    """ Decorator for search methods whose first argument is the haystack,
+    recording their calls while instrumentation is enabled.
+
+    :param matches: Function of the instance and the result returning the
+                    number of matches found (None if unknown)
+    :param lazy:    True if the method returns an iterator, in which case
+                    matches, if given, is a function of the instance and of
+                    the number of items yielded, which is the number of
+                    matches by default
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(obj, haystack, *args, **kwargs):
+            registry = _registry
+            if registry is None or getattr(_local, 'active', False):
+                return f(obj, haystack, *args, **kwargs)
+
+            name = u'{}.{}'.format(type(obj).__name__, f.__name__)
+            size = len(haystack)
+            started = default_timer()
+            _local.active = True
+            try:
+                result = f(obj, haystack, *args, **kwargs)
+            finally:
+                _local.active = False
+                seconds = default_timer() - started
+            if lazy:
+                return _iterate(registry, obj, name, size, iter(result),
+                                seconds, matches)
+            registry.record(_label(obj), name, size,
+                            matches(obj, result) if matches else None,
+                            seconds)
+            return result
+        return wrapper
+    return decorator
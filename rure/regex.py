@@ -1,13 +1,19 @@
 from __future__ import unicode_literals
 import re
 import warnings
-from numbers import Integral
-from six import string_types
+from array import array
+from bisect import bisect_right
+from six import indexbytes, string_types
 
+from rure import _native
 from rure import Rure
 from rure import DEFAULT_FLAGS
 from rure import CASEI, MULTI, DOTNL, SPACE, UNICODE
+from rure import metrics
+from rure import template as _template
+from rure.cache import LRUCache
 from rure.decorators import accepts_string
+from rure.lib import OFFSET_TYPECODE, RureMatch
 
 
 FLAG_MAP = {
@@ -29,6 +35,83 @@ FLAG_NAMES = {
 }
 
 
+# Number of characters between two entries of the offset index of an
+# EncodedString.
+_INDEX_STRIDE = 64
+# Strings shorter than this are cheaper to encode again than to look up.
+_CACHE_MIN_LEN = 1 << 12
+
+
+class EncodedString(object):
+    """ A unicode string along with its UTF-8 encoding, which is what the
+    engine searches, converting offsets between the two.
+
+    Converting a byte offset to a character index uses an index holding the
+    byte offset of every _INDEX_STRIDE-th character, built on first use, so
+    it takes a binary search and the decoding of less than _INDEX_STRIDE
+    characters rather than decoding the whole prefix.
+    """
+
+    def __init__(self, string):
+        self.string = string
+        self.encoded = string.encode('utf8')
+        # ASCII: offsets are the same.
+        self._ascii = len(self.encoded) == len(string)
+        self._index = None
+
+    def _checkpoints(self):
+        if self._index is None:
+            index = array(OFFSET_TYPECODE)
+            offset = 0
+            string = self.string
+            for i in range(0, len(string), _INDEX_STRIDE):
+                index.append(offset)
+                offset += len(string[i:i + _INDEX_STRIDE].encode('utf8'))
+            self._index = index
+        return self._index
+
+    def byte_offset(self, index):
+        """ Converts an index into string to the corresponding offset into
+        its encoding. None stands for the end of string.
+        """
+        if index is None or index >= len(self.string):
+            return len(self.encoded)
+        if index <= 0:
+            return 0
+        if self._ascii:
+            return index
+        stride_start = index - index % _INDEX_STRIDE
+        return self._checkpoints()[index // _INDEX_STRIDE] + \
+            len(self.string[stride_start:index].encode('utf8'))
+
+    def char_offset(self, offset):
+        """ Converts an offset into the encoding of string to the index of
+        the corresponding character.
+        """
+        if self._ascii or offset <= 0:
+            return offset
+        checkpoints = self._checkpoints()
+        i = bisect_right(checkpoints, offset) - 1
+        chunk = self.encoded[checkpoints[i]:offset]
+        return i * _INDEX_STRIDE + len(chunk.decode('utf8', 'ignore'))
+
+
+# Recently searched strings, so that searching the same long string again,
+# with any pattern, does not encode it again. Entries are keyed on the
+# identity of the string, which they keep alive: unicode strings cannot be
+# weakly referenced, until they are evicted or rure.purge is called.
+_encoded_strings = LRUCache(maxsize=8)
+
+
+def _encode(string):
+    if len(string) < _CACHE_MIN_LEN:
+        return EncodedString(string)
+    text = _encoded_strings.get(id(string), lambda: EncodedString(string))
+    if text.string is not string:
+        text = EncodedString(string)
+    return text
+
+
 class RegexObject(object):
 
     def __init__(self, pattern, flags=0, **options):
@@ -50,11 +133,16 @@ class RegexObject(object):
                 else:
                     self.rure_flags = self.rure_flags | rure_flag
 
-        self._rure = Rure(self.pattern, flags=self.rure_flags, **self.options)
-        self._match_rure = None
-        self._match_rure_pos = None
+        self._rure = Rure(self.pattern, flags=self.rure_flags, _utf8=True,
+                          **self.options)
+        # Anchored variants of the pattern, keyed on (prefixed, full).
+        self._anchored_rures = {}
+        # Whether the pattern may have word boundaries, which the engines
+        # looking for matches and for captures can disagree on when a
+        # search does not start at 0 (see _eager).
+        self._boundaries = b'\\b' in self.pattern or b'\\B' in self.pattern
 
-        names = [name for name in self.capture_names()]
+        names = tuple(self.capture_names())
         # This can be greater than len(self.groupindex) due to
         # unnamed groupes
         self.groups = len(names)
@@ -63,81 +151,205 @@ class RegexObject(object):
             for pos, name in enumerate(names)
             if name is not None
         }
+        # Computed once for all matches: the name of each group (or None),
+        # and the (name, index) pairs of the named groups in index order.
+        self._capture_names = names
+        self._named_groups = tuple(sorted(self.groupindex.items(),
+                                          key=lambda item: item[1]))
 
     def capture_names(self):
         return self._rure.capture_names()
 
+    def _window(self, string, pos, endpos):
+        """ Returns the EncodedString of string along with the byte offsets
+        corresponding to pos and endpos, so that searches run over the
+        whole encoded string instead of a re-encoded slice.
+        """
+        text = _encode(string)
+        return text, text.byte_offset(pos), text.byte_offset(endpos)
+
+    def _eager(self, start):
+        """ Returns true if matches searched from byte offset start (None
+        for successive searches) are searched along with their captures,
+        rather than captures being computed once needed: always if
+        submatches, and otherwise where the matches found without captures
+        could differ, so that both modes give the same results.
+        """
+        return self.submatches or (self._boundaries and start != 0)
+
     @accepts_string
+    @metrics.instrumented(metrics.found)
     def is_match(self, string, pos=0, endpos=None):
-        haystack = string[:endpos].encode('utf8')
-        return self._rure.is_match(haystack, pos)
+        text, start, end = self._window(string, pos, endpos)
+        return self._rure.is_match(text.encoded, start, end)
 
     @accepts_string
+    @metrics.instrumented(metrics.found)
     def search(self, string, pos=0, endpos=None):
-        haystack = string[:endpos].encode('utf8')
-        if self.submatches:
-            captures = self._rure.captures(haystack, pos)
+        text, start, end = self._window(string, pos, endpos)
+        if self._eager(start):
+            captures = self._rure.captures(text.encoded, start, end)
             if captures:
-                return MatchObject(pos, endpos, self, haystack, captures)
+                return MatchObject(pos, endpos, self, text, captures)
         else:
-            match = self._rure.find(haystack, pos)
+            match = self._rure.find(text.encoded, start, end)
             if match:
-                return MatchObject(pos, endpos, self, haystack, 0)
-
-    @accepts_string
-    def match(self, string, pos=0, endpos=None):
-        if self._match_rure is None or pos != self._match_rure_pos:
-            self._match_rure_pos = pos
-            if pos > 0:
-                pattern = self.pattern
-            else:
-                pattern = br'\A' + self.pattern
-            self._match_rure = Rure(pattern,
-                                    flags=self.rure_flags,
-                                    **self.options)
-        haystack = string[:endpos].encode('utf8')
+                return MatchObject(pos, endpos, self, text, None,
+                                   match=match, end=end)
+
+    def _anchored_rure(self, prefixed, full):
+        """ Returns the pattern compiled to match only at the start of the
+        haystack (and, if full, to span all of it). If prefixed, the match
+        must follow one leading character, which lets a search anchored at
+        a position past the start still see the character before it.
+        """
+        key = (prefixed, full)
+        rure = self._anchored_rures.get(key)
+        if rure is None:
+            pattern = self.pattern
+            if b'#' in pattern:
+                # End a trailing comment, should verbose mode be on, which
+                # would otherwise swallow the closing parenthesis.
+                pattern += b'(?x)\n'
+            pattern = (br'\A(?s:.)(?:' if prefixed else br'\A(?:') + \
+                pattern + (br')\z' if full else b')')
+            rure = self._anchored_rures[key] = Rure(
+                pattern, flags=self.rure_flags, **self.options)
+        return rure
+
+    def _anchored(self, haystack, start, end, full=False, submatches=False):
+        """ Searches haystack for a match starting exactly at byte offset
+        start, within the window ending at end, with one of the precompiled
+        anchored programs: the cost is the same for any start.
+
+        Returns the captures, or else the RureMatch, of the match, or None.
+        """
+        base = start
+        if start:
+            # The \A of the pattern refers to the start of the buffer, so
+            # search a view starting at the character preceding start.
+            base -= 1
+            if self.rure_flags & UNICODE:
+                while indexbytes(haystack, base) & 0xC0 == 0x80:
+                    base -= 1
+        window = haystack
+        if base or end < len(haystack):
+            window = _native.ffi.from_buffer(haystack)[base:end]
+        rure = self._anchored_rure(base < start, full)
+
+        if not submatches:
+            match = rure.find(window)
+            if match:
+                return RureMatch(start, base + match.end)
+            return None
+        captures = rure.captures(window)
+        if captures is None or not start:
+            return captures
+        return rure.capture_cls(RureMatch(start, base + captures[0].end),
+                                *[None if group is None else
+                                  RureMatch(base + group.start,
+                                            base + group.end)
+                                  for group in captures[1:]])
+
+    def _match(self, string, pos, endpos, full):
+        text, start, end = self._window(string, pos, endpos)
+        if start > end:
+            return None
         if self.submatches:
-            captures = self._match_rure.captures(haystack, pos)
+            captures = self._anchored(text.encoded, start, end, full, True)
             if captures:
-                return MatchObject(pos, endpos, self, haystack, captures)
+                return MatchObject(pos, endpos, self, text, captures)
         else:
-            match = self._match_rure.find(haystack, pos)
+            match = self._anchored(text.encoded, start, end, full)
             if match:
-                return MatchObject(pos, endpos, self, haystack, 0)
+                return MatchObject(pos, endpos, self, text, None,
+                                   match=match, end=end, full=full)
+
+    @accepts_string
+    @metrics.instrumented(metrics.found)
+    def match(self, string, pos=0, endpos=None):
+        return self._match(string, pos, endpos, False)
+
+    @accepts_string
+    @metrics.instrumented(metrics.found)
+    def fullmatch(self, string, pos=0, endpos=None):
+        return self._match(string, pos, endpos, True)
 
     @accepts_string
+    @metrics.instrumented()
     def split(self, string, maxsplit=0):
-        # Not supported by the C library yet
-        raise NotImplementedError
+        """ Like re.split: if the pattern has capture groups, their text is
+        also returned between the pieces (None for groups that did not
+        participate in a match).
+        """
+        haystack = _encode(string).encoded
+        if self.groups == 1:
+            return [piece.decode('utf8')
+                    for piece in self._rure.split(haystack, maxsplit)]
+
+        width = 2 * self.groups
+        offsets = self._rure.captures_all(haystack, limit=maxsplit)
+        pieces = []
+        pos = 0
+        for i in range(0, len(offsets), width):
+            pieces.append(haystack[pos:offsets[i]].decode('utf8'))
+            for j in range(i + 2, i + width, 2):
+                pieces.append(None if offsets[j] < 0 else
+                              haystack[offsets[j]:offsets[j + 1]].decode('utf8'))
+            pos = offsets[i + 1]
+        pieces.append(haystack[pos:].decode('utf8'))
+        return pieces
 
     @accepts_string
+    @metrics.instrumented(metrics.length)
     def findall(self, string, pos=0, endpos=None):
         return [match.groups() for match in self.finditer(string, pos, endpos)]
 
     @accepts_string
+    @metrics.instrumented(lazy=True)
     def finditer(self, string, pos=0, endpos=None):
-        haystack = string[:endpos].encode('utf8')
-        if self.submatches:
-            for captures in self._rure.captures_iter(haystack, pos):
-                yield MatchObject(pos, endpos, self, haystack, captures)
+        text, start, end = self._window(string, pos, endpos)
+        if self._eager(None):
+            for captures in self._rure.captures_iter(text.encoded, start, end):
+                yield MatchObject(pos, endpos, self, text, captures)
         else:
-            for i, match in enumerate(self._rure.find_iter(haystack, pos)):
-                yield MatchObject(pos, endpos, self, haystack, i)
+            for match in self._rure.find_iter(text.encoded, start, end):
+                yield MatchObject(pos, endpos, self, text, None,
+                                  match=match, end=end)
 
     @accepts_string
     def sub(self, repl, string, count=0):
-        # Not supported by the C library yet
-        raise NotImplementedError
+        return self.subn(repl, string, count)[0]
 
     @accepts_string
     def subn(self, repl, string, count=0):
-        # Not supported by the C library yet
-        raise NotImplementedError
+        """ Like re.subn, except that references in a repl template use the
+        syntax of the Rust regex crate: ``$1``, ``$name``, ``${name}`` and
+        ``$$`` for a literal ``$``.
+        """
+        if isinstance(string, bytes):
+            raise TypeError("{}.{}.subn requires a unicode string to search "
+                            "in".format(self.__class__.__module__,
+                                        self.__class__.__name__))
+        text = _encode(string)
+        if callable(repl):
+            def rure_repl(captures):
+                match = MatchObject(0, None, self, text, captures)
+                return repl(match).encode('utf8')
+        else:
+            rure_repl = repl.encode('utf8')
+        result, n = self._rure.subn(rure_repl, text.encoded, count)
+        return result.decode('utf8'), n
 
 
 class MatchObject(object):
+    """ A match of a RegexObject. As with re, start, end and span return
+    indices into string. The captures, however, hold the byte offsets of
+    the groups in the UTF-8 encoding of string that the engine searched.
+    """
 
-    offset_warning = u"This returns byte offsets; use with {}.{}::string"
+    __slots__ = ('pos', 'endpos', 're', '_text', '_captures', '_match',
+                 '_end', '_full')
 
     def __bool__(self):
         return True
@@ -145,66 +357,84 @@ class MatchObject(object):
     def __nonzero__(self):
         return self.__bool__()
 
-    def __init__(self, pos, endpos, re, string, captures):
+    def __init__(self, pos, endpos, re, text, captures, match=None,
+                 end=None, full=False):
         self.pos = pos
-        self.endpos = pos
+        self.endpos = endpos
         self.re = re
-        self.string = string
+        self._text = text
         self._captures = captures
+        # Without captures: the overall match, and the byte offset the
+        # search ended at, from which the captures are computed lazily.
+        self._match = match
+        self._end = end
+        self._full = full
 
-    def _warn(self, mname):
-        warnings.warn(
-            self.offset_warning.format(
-                self.__class__.__module__,
-                self.__class__.__name__,
-                mname),
-            UnicodeWarning,
-            stacklevel=2)
+    @property
+    def string(self):
+        return self._text.string
 
     @property
     def lastindex(self):
-        groups = [
-            gindex
-            for gindex, gname in enumerate(self.re.capture_names())
-            if self.captures[gindex] is not None
-        ]
-        if groups:
-            return groups[-1]
+        captures = self.captures
+        for gindex in range(len(captures) - 1, -1, -1):
+            if captures[gindex] is not None:
+                return gindex
 
     @property
     def lastgroup(self, decode=True):
-        groups = [
-            gname
-            for gindex, gname in enumerate(self.re.capture_names())
-            if gname is not None and self.captures[gindex] is not None
-        ]
-        if groups:
-            if decode:
-                return groups[-1].decode('utf8')
-            else:
-                return groups[-1]
+        names = self.re._capture_names
+        captures = self.captures
+        for gindex in range(len(names) - 1, -1, -1):
+            if names[gindex] is not None and captures[gindex] is not None:
+                if decode:
+                    return names[gindex].decode('utf8')
+                else:
+                    return names[gindex]
 
     @property
     def captures(self):
-        if isinstance(self._captures, Integral):
-            all_captures = list(self.re._rure.captures_iter(self.string,
-                                                            self.pos))
-            self._captures = all_captures[self._captures]
+        if self._captures is None:
+            match = self._match
+            encoded = self._text.encoded
+            # The match found is the preferred one of those starting at its
+            # start, so a search anchored there normally finds it again, and
+            # only scans the text of the match.
+            captures = self.re._anchored(encoded, match.start, self._end,
+                                         self._full, True)
+            if captures is None:
+                # Should the engines disagree on the text before the match
+                # after all, search from its start as the match was found.
+                captures = self.re._rure.captures(encoded, match.start,
+                                                  self._end)
+            self._captures = captures
         return self._captures
 
+    def _group(self, group):
+        if group == 0 and self._match is not None:
+            return self._match
+        return self.captures[group]
+
     def expand(self, template):
-        # Not supported by the C library yet
-        raise NotImplementedError
+        """ Returns the string obtained by substituting the groups of this
+        match into template, as done by RegexObject.sub.
+        """
+        parts = _template.parse(template.encode('utf8'), self.re.groupindex)
+        offsets = []
+        for capture in self.captures:
+            offsets.extend((-1, -1) if capture is None else capture)
+        return _template.expand(parts, self._text.encoded,
+                                offsets).decode('utf8')
 
     def group(self, *groups, **kwargs):
         default = kwargs.get('default', None)
         decode = kwargs.get('decode', True)
         if not groups:
-            start, end = self.captures[0].start, self.captures[0].end
+            start, end = self._group(0)
             if decode:
-                return self.string[start:end].decode('utf8')
+                return self._text.encoded[start:end].decode('utf8')
             else:
-                return self.string[start:end]
+                return self._text.encoded[start:end]
 
         capture_data = []
         for i in groups:
@@ -213,11 +443,11 @@ class MatchObject(object):
             else:
                 if i < 0:
                     raise IndexError(i)
-                match = self.captures[i]
+                match = self._group(i)
             if match is None:
                 capture_data.append(default)
             else:
-                data = self.string[match.start:match.end]
+                data = self._text.encoded[match.start:match.end]
                 if decode:
                     capture_data.append(data.decode('utf8'))
                 else:
@@ -233,40 +463,33 @@ class MatchObject(object):
                           default=default)
 
     def groupdict(self, default=None, decode=True):
-        group_indices = sorted(self.re.groupindex.values())
-        group_data = self.group(*[i for i in group_indices], default=default)
         gdict = {}
-        for pos, g_name_index in enumerate(
-                sorted(self.re.groupindex.items(),
-                       # Sort by value
-                       key=lambda x: x[1])):
-            gname = g_name_index[0]
-            gval = group_data[pos]
-            if decode:
-                if isinstance(gname, bytes):
-                    gname = gname.decode('utf8')
-                if isinstance(gval, bytes):
+        for gname, gindex in self.re._named_groups:
+            match = self._group(gindex)
+            if match is None:
+                gval = default
+            else:
+                gval = self._text.encoded[match.start:match.end]
+                if decode:
                     gval = gval.decode('utf8')
+            if decode:
+                gname = gname.decode('utf8')
             gdict[gname] = gval
         return gdict
 
     def start(self, group=0):
-        self._warn(u'start')
-
-        if self.captures[group] is None:
+        match = self._group(group)
+        if match is None:
             return -1
         else:
-            return self.captures[group].start
+            return self._text.char_offset(match.start)
 
     def end(self, group=0):
-        self._warn(u'end')
-
-        if self.captures[group] is None:
+        match = self._group(group)
+        if match is None:
             return -1
         else:
-            return self.captures[group].end
+            return self._text.char_offset(match.end)
 
     def span(self, group=0):
-        self._warn(u'span')
-
         return (self.start(group), self.end(group))
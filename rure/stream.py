@@ -0,0 +1,167 @@
+from rure import _native
+from rure.lib import RureMatch
+
+
+# Default number of bytes a match may span when no max_match_len is given.
+DEFAULT_WINDOW = 1 << 16
+# Default number of bytes read at a time from file-like objects.
+DEFAULT_CHUNK_SIZE = 1 << 16
+# Bytes kept in front of the unresolved tail, so that assertions such as \b
+# or a multi-line ^ still see the full character preceding it.
+_CONTEXT = 4
+
+
+def _complete_len(buf):
+    """ Returns the length of buf without any incomplete UTF-8 sequence that
+    a chunk boundary may have cut off at its end.
+    """
+    size = len(buf)
+    for i in range(size - 1, max(size - 4, -1), -1):
+        byte = buf[i]
+        if byte < 0x80:
+            break
+        if byte >= 0xC0:
+            width = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return size if size - i >= width else i
+    return size
+
+
+class StreamMatcher(object):
+    """ Finds the successive non-overlapping matches of a Rure in a stream
+    of byte chunks whose total length need not be known, such as a socket,
+    a pipe or a decompressing reader. Matches are reported with absolute
+    offsets into the stream.
+
+    A match starting at offset s can only change while fewer than
+    max_match_len bytes past s have been seen: once they have, no longer
+    match from s, nor any match starting earlier, can appear. Matches are
+    therefore reported as soon as they are resolved, and only the
+    unresolved tail of the stream is kept, so memory use is bounded by
+    max_match_len plus the size of one chunk.
+
+    Patterns without a bounded match length (``a+``, ``.*``, ...) are
+    handled with the same window: their results are exact as long as no
+    match is longer than max_match_len. A longer match starting at s is
+    replaced by the match starting at s found when the stream is cut
+    max_match_len bytes past s, if any, whatever the size of the chunks.
+    Give a bound that holds for the data (e.g. the maximum line length for
+    a pattern that cannot cross newlines) rather than relying on the
+    default window.
+    """
+
+    def __init__(self, re, max_match_len=None):
+        """
+        :param re:            Compiled Rure to search with
+        :param max_match_len: Upper bound, in bytes, on the length of a match
+                              (default: DEFAULT_WINDOW)
+        """
+        self.re = re
+        self.window = DEFAULT_WINDOW if max_match_len is None \
+            else max_match_len
+        self._reset()
+
+    def _reset(self):
+        # Unresolved tail of the stream, preceded by up to _CONTEXT bytes.
+        self._buf = bytearray()
+        # Absolute stream offset of self._buf[0].
+        self._base = 0
+        # Offset in self._buf at which the next search starts.
+        self._pos = 0
+        # Absolute end offset of the last match reported.
+        self._last = None
+
+    def feed(self, chunk):
+        """ Appends the bytes-like chunk to the stream and returns the list
+        of matches that are resolved as a result.
+        """
+        self._buf += chunk
+        return self._scan(final=False)
+
+    def close(self):
+        """ Marks the end of the stream and returns the remaining matches.
+        The matcher can then be reused for a new stream.
+        """
+        matches = self._scan(final=True)
+        self._reset()
+        return matches
+
+    def find_iter(self, source, chunk_size=DEFAULT_CHUNK_SIZE):
+        """ Returns an iterator over the matches in source, which is either
+        a file-like object with a read method or an iterable of byte chunks.
+        The matcher is closed once source is exhausted.
+        """
+        read = getattr(source, 'read', None)
+        if read is not None:
+            source = iter(lambda: read(chunk_size), b'')
+        for chunk in source:
+            for match in self.feed(chunk):
+                yield match
+        for match in self.close():
+            yield match
+
+    def _scan(self, final):
+        ffi = _native.ffi
+        find = _native.lib.rure_find
+        buf = self._buf
+        base = self._base
+        # Until the stream ends, keep a character split by a chunk boundary
+        # out of the search; the engine is not meant to see partial UTF-8.
+        hlen = len(buf) if final else _complete_len(buf)
+        # Matches starting before limit are resolved. It is kept on a
+        # character boundary, since searches may resume from it.
+        if final:
+            limit = hlen + 1
+        else:
+            limit = hlen - self.window
+            while 0 < limit < hlen and 0x80 <= buf[limit] < 0xC0:
+                limit -= 1
+        start = self._pos
+        last = None if self._last is None else self._last - base
+        matches = []
+
+        haystack = ffi.from_buffer(buf)
+        match = ffi.new('rure_match *')
+        try:
+            while start <= hlen and start < limit:
+                if not find(self.re._ptr, haystack, hlen, start, match) or \
+                        match.start >= limit:
+                    # Nothing can start before limit; beyond it, more of
+                    # the stream is needed to decide.
+                    start = max(start, limit)
+                    break
+                if match.end - match.start > self.window:
+                    # Cut the stream at the window, as the result would
+                    # otherwise depend on how much of it has been read.
+                    match_start = match.start
+                    if not find(self.re._ptr, haystack,
+                                match_start + self.window, match_start,
+                                match) or match.start != match_start:
+                        # Nothing starts there within the window: as when
+                        # the stream is read in smaller chunks, resume at
+                        # the next character.
+                        start = match_start + 1
+                        while start < hlen and 0x80 <= buf[start] < 0xC0:
+                            start += 1
+                        continue
+                end = match.end
+                if match.start == end:
+                    start = end + 1
+                    if end == last:
+                        continue
+                else:
+                    start = end
+                last = end
+                matches.append(RureMatch(base + match.start, base + end))
+        finally:
+            ffi.release(haystack)
+
+        keep = max(0, min(start, hlen) - _CONTEXT)
+        while keep and 0x80 <= buf[keep] < 0xC0:
+            # Don't cut a character preceding the tail in two either.
+            keep -= 1
+        del buf[:keep]
+        self._base = base + keep
+        self._pos = start - keep
+        if last is not None:
+            self._last = base + last
+        return matches
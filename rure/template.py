@@ -0,0 +1,60 @@
+import re
+
+
+# A reference in a replacement template, following the rules of the Rust
+# regex crate: $$ is a literal $, while ${name} and $name refer to a
+# capture group by index or name, $name taking the longest run of letters,
+# digits and underscores. A $ not followed by any of these is kept as is.
+_REFERENCE = re.compile(br'\$(?:(\$)|\{([0-9A-Za-z_]+)\}|([0-9A-Za-z_]+))')
+
+
+def parse(template, names):
+    """ Splits the byte string template into a list of literal byte strings
+    and integer capture group indices.
+
+    :param template: Replacement template
+    :param names:    Mapping of capture group names (bytes) to indices.
+                     References to unknown groups expand to nothing.
+    """
+    if not isinstance(template, bytes):
+        raise TypeError("replacement template must be of type 'bytes'")
+    parts = []
+    pos = 0
+    for ref in _REFERENCE.finditer(template):
+        dollar, braced, bare = ref.groups()
+        if ref.start() > pos:
+            parts.append(template[pos:ref.start()])
+        pos = ref.end()
+        if dollar:
+            parts.append(dollar)
+            continue
+        name = braced or bare
+        parts.append(int(name) if name.isdigit() else names.get(name, -1))
+    if pos < len(template):
+        parts.append(template[pos:])
+    return parts
+
+
+def is_literal(parts):
+    """ Returns true if the parsed template parts don't refer to any capture
+    group.
+    """
+    return all(isinstance(part, bytes) for part in parts)
+
+
+def expand(parts, text, offsets):
+    """ Returns the replacement for parsed template parts.
+
+    :param text:    Sliceable haystack the offsets refer to
+    :param offsets: Flat sequence of capture group offsets of a match,
+                    ``[start0, end0, start1, end1, ...]``, in which groups
+                    that did not participate are marked by negative offsets
+    """
+    pieces = []
+    groups = len(offsets) // 2
+    for part in parts:
+        if isinstance(part, bytes):
+            pieces.append(part)
+        elif 0 <= part < groups and offsets[2 * part] >= 0:
+            pieces.append(text[offsets[2 * part]:offsets[2 * part + 1]])
+    return b''.join(pieces)
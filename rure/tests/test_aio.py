@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from rure.lib import Rure, RureSet
+
+try:
+    import asyncio
+    from rure import aio
+except (ImportError, SyntaxError):
+    aio = None
+
+
+@unittest.skipIf(aio is None, "asyncio is not available")
+class TestAio(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(2)
+        aio.configure(inline_threshold=16, executor=self.executor)
+
+    def tearDown(self):
+        aio.configure(aio.DEFAULT_INLINE_THRESHOLD)
+        self.executor.shutdown()
+        self.loop.close()
+
+    def test_rure(self):
+        re = Rure(b"\\d+")
+        for haystack in (b"a1 b22", bytearray(b"a1 b22 " * 10)):
+            self.assertEqual(
+                self.loop.run_until_complete(re.afind_all(haystack)),
+                re.find_all(haystack))
+            self.assertEqual(
+                self.loop.run_until_complete(re.acount(haystack, start=3)),
+                re.count(haystack, start=3))
+            self.assertTrue(self.loop.run_until_complete(re.ais_match(
+                haystack)))
+
+    def test_rureset(self):
+        res = RureSet(b"foo", b"bar")
+        haystack = b"x" * 100 + b"bar"
+        self.assertEqual(self.loop.run_until_complete(res.amatches(haystack)),
+                         [False, True])
+        self.assertEqual(
+            len(self.loop.run_until_complete(res.afind_matches(haystack))), 1)
+
+    def test_cancel(self):
+        re = Rure(b"\\w+")
+        task = self.loop.create_task(re.afind_all(b"ab " * (1 << 14)))
+        self.loop.call_soon(task.cancel)
+        self.assertRaises(asyncio.CancelledError,
+                          self.loop.run_until_complete, task)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+
+import rure
+from rure.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru(self):
+        cache = LRUCache(maxsize=2)
+        self.assertEqual(cache.get("a", lambda: 1), 1)
+        self.assertEqual(cache.get("b", lambda: 2), 2)
+        self.assertEqual(cache.get("a", lambda: 3), 1)
+        self.assertEqual(cache.get("c", lambda: 4), 4)
+        self.assertEqual(cache.get("b", lambda: 5), 5)
+        self.assertEqual(cache.info(), (1, 4, 2, 2, 2))
+        cache.resize(1)
+        self.assertEqual(cache.info().currsize, 1)
+        self.assertEqual(cache.get("b", lambda: 6), 5)
+        self.assertEqual(cache.get(["unhashable"], lambda: 7), 7)
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 0, 1, 0))
+
+    def test_module_functions(self):
+        rure.purge()
+        pattern = rure.compile(u"\\w+", rure.I)
+        self.assertIs(rure.compile(u"\\w+", rure.I), pattern)
+        self.assertIsNot(rure.compile(u"\\w+"), pattern)
+        self.assertEqual(rure.search(u"\\w+", u" ab", rure.I).group(), u"ab")
+        info = rure.cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 2))
+        rure.set_cache_size(0)
+        self.assertIsNot(rure.compile(u"\\w+", rure.I), pattern)
+        self.assertEqual(rure.cache_info().currsize, 0)
+        rure.set_cache_size(512)
+        rure.purge()
+
+    def test_string_cache(self):
+        from rure.regex import _encoded_strings
+        text = u"☃ " * 4096
+        rure.compile(u"\\S").search(text)
+        self.assertEqual(_encoded_strings.info().currsize, 1)
+        rure.purge()
+        self.assertEqual(_encoded_strings.info().currsize, 0)
+        rure.set_string_cache_size(0)
+        rure.compile(u"\\S").search(text)
+        self.assertEqual(_encoded_strings.info().currsize, 0)
+        rure.set_string_cache_size(8)
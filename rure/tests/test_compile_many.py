@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+
+import rure
+from rure.exceptions import CompiledTooBigError, RegexSyntaxError
+
+
+class TestCompileMany(unittest.TestCase):
+
+    def test_compile_many(self):
+        calls = []
+        patterns = [b"\\w+", u"\\d+", b"(", u"\\w{100}"]
+        compiled, errors = rure.compile_many(
+            patterns, workers=2, size_limit=1 << 16,
+            callback=lambda *args: calls.append(args))
+        self.assertIsInstance(compiled[0], rure.Rure)
+        self.assertIsInstance(compiled[1], rure.RegexObject)
+        self.assertEqual(compiled[1].search(u"ab12").group(), u"12")
+        self.assertEqual(compiled[2:], [None, None])
+        self.assertEqual(errors[:2], [None, None])
+        self.assertIsInstance(errors[2], RegexSyntaxError)
+        self.assertIsInstance(errors[3], CompiledTooBigError)
+        self.assertEqual(sorted(call[0] for call in calls), [0, 1, 2, 3])
+        self.assertTrue(all(call[1] >= 0 for call in calls))
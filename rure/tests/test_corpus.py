@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import shutil
+import tempfile
+import unittest
+
+from rure.lib import Rure, RureSet
+
+try:
+    from rure.corpus import CorpusScanner
+except ImportError:
+    CorpusScanner = None
+
+
+@unittest.skipIf(CorpusScanner is None, "shared_memory is not available")
+class TestCorpusScanner(unittest.TestCase):
+
+    documents = [b"", b"a1 b22", bytearray(b"c333"), b"no digits",
+                 memoryview(b"4 55 666")] * 3
+
+    def test_scan(self):
+        re = Rure(b"\\d+")
+        expected = [re.find_all(document) for document in self.documents]
+        with CorpusScanner(b"\\d+", "find_all", workers=2, max_in_flight=2,
+                           batch_size=8) as scanner:
+            results = list(scanner.scan(self.documents))
+            self.assertEqual([index for index, _ in results],
+                             list(range(len(self.documents))))
+            self.assertEqual([result for _, result in results], expected)
+
+            unordered = sorted(scanner.scan(self.documents, ordered=False))
+            self.assertEqual(unordered, results)
+
+            self.assertEqual(list(scanner.scan([b"1 2 3", b"4 5"], start=2)),
+                             [(0, re.find_all(b"1 2 3", start=2)),
+                              (1, re.find_all(b"4 5", start=2))])
+
+    def test_scan_set(self):
+        patterns = [b"\\d", b"[a-c]", b"x"]
+        rset = RureSet(*patterns)
+        with CorpusScanner(patterns, "matches", workers=2,
+                           batch_size=16) as scanner:
+            self.assertEqual(list(scanner.scan(self.documents)),
+                             [(i, rset.matches(document))
+                              for i, document in enumerate(self.documents)])
+
+    def test_scan_files(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        paths = []
+        for i, document in enumerate(self.documents):
+            paths.append(os.path.join(tmpdir, str(i)))
+            with open(paths[-1], "wb") as fobj:
+                fobj.write(document)
+        re = Rure(b"\\d+")
+        with CorpusScanner(b"\\d+", "count", workers=2,
+                           batch_size=8) as scanner:
+            self.assertEqual(sorted(scanner.scan_files(paths, ordered=False)),
+                             [(i, re.count(document))
+                              for i, document in enumerate(self.documents)])
+
+    def test_abandoned_scan(self):
+        with CorpusScanner(b"\\d", "is_match", workers=1, max_in_flight=1,
+                           batch_size=1) as scanner:
+            results = scanner.scan(self.documents)
+            self.assertEqual(next(results), (0, False))
+            results.close()
+            self.assertEqual(list(scanner.scan([b"1"])), [(0, True)])
+
+    def test_invalid_method(self):
+        self.assertRaises(ValueError, CorpusScanner, b"a", "nope",
+                          workers=1)
+
+    def test_worker_error(self):
+        with CorpusScanner(b"a", "find", workers=1) as scanner:
+            with self.assertRaises(TypeError):
+                list(scanner.scan([b"abc"], start="x"))
+            with self.assertRaises(TypeError):
+                list(scanner.scan_files([__file__], start="x"))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import unittest
+import warnings
+
+from rure.literals import analyze
+
+
+class TestLiterals(unittest.TestCase):
+
+    def test_complete(self):
+        found = analyze(b"Sherlock|Holmes")
+        self.assertEqual(found.prefixes, (b"Holmes", b"Sherlock"))
+        self.assertTrue(found.complete)
+        self.assertEqual(len(analyze(b"the", icase=True).prefixes), 8)
+        self.assertFalse(analyze(b"ab+c").complete)
+
+    def test_anchors(self):
+        found = analyze(b"\\Aab\\z")
+        self.assertTrue(found.anchored_start and found.anchored_end)
+        self.assertFalse(analyze(b"^ab", multiline=True).anchored_start)
+        # Literals of partially anchored patterns are not searched for.
+        self.assertEqual(analyze(b"^a|b").prefixes, ())
+
+    def test_word_boundary(self):
+        self.assertTrue(analyze(b"\\bfoo").unicode_word_boundary)
+        self.assertFalse(analyze(b"(?-u:\\bfoo)").unicode_word_boundary)
+        self.assertFalse(analyze(b"\\bfoo",
+                                 unicode=False).unicode_word_boundary)
+
+    def test_rust_syntax(self):
+        self.assertEqual(analyze(b"\\x{61}\\pLb\\z").prefixes, (b"a",))
+        self.assertIsNone(analyze(b"a(?i)b"))
+        self.assertEqual(analyze(b"[[:alpha:]]xyz").suffixes, (b"xyz",))
+
+    def test_class_operations(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            for pattern in (b"[a-z&&[^aeiou]]xyz", b"[a--b]", b"[a~~b]c"):
+                self.assertIsNone(analyze(pattern))
+        self.assertEqual(analyze(b"[]a]b").prefixes, (b"]b", b"ab"))
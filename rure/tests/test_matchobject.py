@@ -48,7 +48,40 @@ class TestMatchObject(unittest.TestCase):
         self.assertEqual(m.groupdict(), {u'first_name': u'Malcolm',
                                          u'last_name': u'Reynolds'})
 
+    def test_expand(self):
+        m = rure.search(u"(?P<first>\\w+) (\\w+)(x)?", u"Malcolm Reynolds")
+        self.assertEqual(m.expand(u"$2, ${first}$3 $$"),
+                         u"Reynolds, Malcolm $")
+
+    def test_lastindex_lastgroup(self):
+        m = rure.search(u"(?P<a>x)(y)?(?P<c>z)?", u"xy")
+        self.assertEqual(m.lastindex, 2)
+        self.assertEqual(m.lastgroup, u"a")
+        self.assertEqual(m.groupdict(u"-"), {u"a": u"x", u"c": u"-"})
+        self.assertEqual(rure.search(u"(?P<a>x)", u"x").groupdict(),
+                         {u"a": u"x"})
+
+    def test_slots(self):
+        m = rure.search(u"x", u"x")
+        self.assertFalse(hasattr(m, "__dict__"))
+
     def test_start_end(self):
         m = rure.search(u"remove_this", u"tony@tiremove_thisger.net")
-        self.assertEqual((m.string[:m.start()] + m.string[m.end():]).decode('utf8'),
+        self.assertEqual(m.string[:m.start()] + m.string[m.end():],
                          u'tony@tiger.net')
+
+    def test_start_end_unicode(self):
+        string = u"é" * 300 + u" née ü"
+        m = rure.search(u"n(é)e", string)
+        self.assertEqual(m.span(), (301, 304))
+        self.assertEqual(m.span(1), (302, 303))
+        self.assertEqual(m.captures[1], (602, 604))
+        self.assertIs(m.string, string)
+        self.assertEqual([m.start() for m in rure.finditer(u"[üe]", string)],
+                         [303, 305])
+
+    def test_encoded_string_cache(self):
+        string = u"é" * 5000 + u"x"
+        m = rure.search(u"x", string)
+        self.assertIs(rure.search(u"é", string)._text, m._text)
+        self.assertEqual(m.span(), (5000, 5001))
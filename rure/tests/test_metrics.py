@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+import unittest
+
+import rure
+from rure import metrics
+from rure.lib import Rure, RureSet
+
+
+class TestMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+
+    def test_disabled(self):
+        self.assertIsNone(metrics.get_registry())
+        self.assertTrue(Rure(b"a").is_match(b"a"))
+        registry = metrics.enable()
+        self.assertIs(metrics.disable(), registry)
+        Rure(b"a").is_match(b"a")
+        self.assertEqual(registry.as_dict(), {})
+
+    def test_record(self):
+        registry = metrics.enable()
+        re = Rure(b"\\d+")
+        re.is_match(b"a1")
+        re.is_match(bytearray(b"b"))
+        self.assertEqual(re.find_all(b"1 2 3"), re.find_all(b"1 2 3"))
+        self.assertEqual(re.captures_all(b"1 2"), re.captures_all(b"1 2"))
+        abc = RureSet(b"a", b"b", b"c")
+        abc.matches(b"ab")
+        RureSet(b"a", b"b", b"d").matches(b"ab")
+        RureSet(b"a", b"b", name=u"ab").matches(b"ab")
+        rure.compile(u"(é)").findall(u"éé")
+
+        recorded = registry.as_dict()
+        is_match = recorded[u"\\d+"]["Rure.is_match"]
+        self.assertEqual((is_match["calls"], is_match["length"],
+                          is_match["matches"]), (2, 3, 1))
+        self.assertEqual(is_match["histogram"]["+Inf"], 2)
+        self.assertEqual(recorded[u"\\d+"]["Rure.find_all"]["matches"], 6)
+        self.assertEqual(recorded[u"\\d+"]["Rure.captures_all"]["matches"],
+                         4)
+        self.assertTrue(abc.metrics_label().startswith(u"a|... (3 patterns, "))
+        self.assertEqual(
+            recorded[abc.metrics_label()]["RureSet.matches"]["calls"], 1)
+        self.assertEqual(recorded[u"ab"]["RureSet.matches"]["matches"], 2)
+        abc.append(b"e")
+        self.assertNotIn(abc.metrics_label(), recorded)
+        # Only the outermost call is recorded.
+        self.assertEqual(list(recorded[u"(é)"]), ["RegexObject.findall"])
+        self.assertEqual(recorded[u"(é)"]["RegexObject.findall"]["matches"],
+                         2)
+        json.dumps(recorded)
+
+        registry.reset()
+        self.assertEqual(registry.as_dict(), {})
+
+    def test_iterators(self):
+        registry = metrics.enable()
+        re = Rure(b"\\d")
+        self.assertEqual(len(list(re.find_iter(b"1 2 3"))), 3)
+        matches = re.captures_iter(b"1 2 3")
+        next(matches)
+        self.assertNotIn("Rure.captures_iter", registry.as_dict()[u"\\d"])
+        matches.close()
+        recorded = registry.as_dict()[u"\\d"]
+        self.assertEqual(recorded["Rure.find_iter"]["matches"], 3)
+        self.assertEqual(recorded["Rure.captures_iter"]["matches"], 1)
+
+        self.assertEqual(len(list(re.split_iter(b"1 2 3"))), 4)
+        recorded = registry.as_dict()[u"\\d"]["Rure.split_iter"]
+        self.assertEqual((recorded["calls"], recorded["matches"]), (1, 3))
+
+        # Consumed within another instrumented call, which stays active.
+        matches = re.find_iter(b"1 2")
+        metrics._local.active = True
+        try:
+            next(matches)
+            self.assertTrue(metrics._local.active)
+        finally:
+            metrics._local.active = False
+
+    def test_slow_calls(self):
+        calls = []
+        metrics.enable(slow_threshold=0, on_slow=calls.append)
+        Rure(b"a").find(b"xa")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0][:3], (u"a", "Rure.find", 2))
+        metrics.enable(slow_threshold=60, on_slow=calls.append)
+        Rure(b"a").find(b"xa")
+        self.assertEqual(len(calls), 1)
+
+    def test_exposition(self):
+        registry = metrics.enable(buckets=(0.5, 60))
+        Rure(b'"\\w"').is_match(b'"a"')
+        self.assertEqual(registry.exposition().splitlines()[2::3][:3], [
+            u'rure_calls_total{pattern="\\"\\\\w\\"",'
+            u'method="Rure.is_match"} 1',
+            u'rure_scanned_total{pattern="\\"\\\\w\\"",'
+            u'method="Rure.is_match"} 3',
+            u'rure_matches_total{pattern="\\"\\\\w\\"",'
+            u'method="Rure.is_match"} 1',
+        ])
+        self.assertIn(u'rure_call_seconds_bucket{pattern="\\"\\\\w\\"",'
+                      u'method="Rure.is_match",le="60.0"} 1',
+                      registry.exposition())
@@ -20,6 +20,44 @@ class TestRegexObject(unittest.TestCase):
         self.assertFalse(pattern.match(u"dog"))
         self.assertTrue(pattern.match(u"dog", 1))
 
+    def test_match_pos(self):
+        for submatches in (False, True):
+            pattern = rure.compile(u"\\b(é)\\w", submatches=submatches)
+            string = u"é1 xé2 é3"
+            for pos in (7, 0, 4, 3, 7):
+                match = pattern.match(string, pos)
+                stdlib_match = re.compile(u"\\b(é)\\w").match(string, pos)
+                self.assertEqual(match and match.group(1, 0),
+                                 stdlib_match and stdlib_match.group(1, 0))
+            self.assertEqual(len(pattern._anchored_rures), 2)
+        self.assertFalse(rure.compile(u"^a").match(u"ba", 1))
+        self.assertTrue(rure.compile(u"a # c", rure.X).match(u"ba", 1))
+
+    def test_fullmatch(self):
+        pattern = rure.compile(u"a|ab")
+        self.assertEqual(pattern.match(u"ab").group(), u"a")
+        self.assertEqual(pattern.fullmatch(u"ab").group(), u"ab")
+        self.assertEqual(pattern.fullmatch(u"xab", 1, 2).group(), u"a")
+        self.assertIsNone(pattern.fullmatch(u"abc"))
+        self.assertEqual(rure.fullmatch(u"(a)(b)", u"ab").groups(),
+                         (u"a", u"b"))
+
+    def test_search_window(self):
+        pattern = rure.compile(u"\\w+")
+        self.assertEqual(pattern.search(u"ab cd ef", 3, 4).group(), u"c")
+        self.assertFalse(pattern.search(u"ab cd", 2, 3))
+        self.assertEqual(
+            [m.group() for m in pattern.finditer(u"ab cd ef", 1, 7)],
+            [u"b", u"cd", u"e"])
+
+    def test_search_window_unicode(self):
+        pattern = rure.compile(u"\\w+$")
+        haystack = u"\u00e9t\u00e9 h\u00e9t\u00e9ro"
+        self.assertEqual(pattern.search(haystack, 0, 8).group(),
+                         u"h\u00e9t\u00e9")
+        self.assertTrue(pattern.is_match(haystack, 5, 6))
+        self.assertFalse(pattern.is_match(haystack, 0, 4))
+
     def test_findall(self):
         haystack = u"abc xyz"
         pattern = rure.compile(u"\\w+(\\w)")
@@ -38,6 +76,60 @@ class TestRegexObject(unittest.TestCase):
         self.assertIsNotNone(match)
         self.assertEqual(match.captures[-1], RureMatch(6, 7))
 
+    def test_sub(self):
+        pattern = rure.compile(u"(?P<w>\\w+)@(\\w+)")
+        self.assertEqual(pattern.subn(u"${w} at $2", u"é@x, a@b"),
+                         (u"é at x, a at b", 2))
+        self.assertEqual(pattern.sub(lambda m: m.group(2).upper(),
+                                     u"é@x, a@b", count=1),
+                         u"X, a@b")
+        self.assertEqual(rure.sub(u"\\d", u"#", u"a1b22"), u"a#b##")
+        self.assertEqual(rure.sub(u"a", u"b", u"aaa", count=2 ** 62), u"bbb")
+        self.assertRaises(TypeError, pattern.sub, u"", b"a@b")
+
+    def test_split(self):
+        for ptn, string in ((u",\\s*", u"é, b,,c"),
+                            (u"(,)|(;)", u"a,b;c"),
+                            (u"(\\s)+", u"a  bc d")):
+            self.assertEqual(rure.compile(ptn).split(string),
+                             re.split(ptn, string))
+            self.assertEqual(rure.compile(ptn).split(string, 1),
+                             re.split(ptn, string, 1))
+            self.assertEqual(rure.compile(ptn).split(string, 2 ** 62),
+                             re.split(ptn, string))
+
+    def test_lazy_captures(self):
+        string = u"xabc ab é1 abab"
+        for ptn in (u"(ab)\\b|(ab)", u"(\\w)(\\w)?", u"(a*)"):
+            lazy = rure.compile(ptn).finditer(string, 1)
+            eager = rure.compile(ptn, submatches=True).finditer(string, 1)
+            self.assertEqual([m.captures for m in lazy],
+                             [m.captures for m in eager])
+        match = rure.compile(u"(b)").search(u"abc")
+        self.assertEqual(match.span(), (1, 2))
+        self.assertIsNone(match._captures)
+        self.assertEqual(match.span(1), (1, 2))
+        # The engines finding matches and captures disagree on the text
+        # before the start of a search for \b: both modes follow the latter.
+        for ptn, string, pos in ((u"\\b(\\w)?", u"dc\n", 0),
+                                 (u"\\b(\\w)(\\w*)", u"\xc9x \xe91", 1)):
+            lazy = rure.compile(ptn)
+            eager = rure.compile(ptn, submatches=True)
+            self.assertEqual([m.captures for m in lazy.finditer(string)],
+                             [m.captures for m in eager.finditer(string)])
+            self.assertEqual(lazy.search(string, pos) and
+                             lazy.search(string, pos).captures,
+                             eager.search(string, pos) and
+                             eager.search(string, pos).captures)
+        self.assertEqual(rure.findall(u"\\b(\\w)?", u"dc\n"), [u"d", None])
+
+    def test_empty_matches_within_characters(self):
+        self.assertEqual(rure.sub(u"a*", u"-", u"éaé"), u"-é-é-")
+        self.assertEqual(rure.compile(u"a*").split(u"éaé"),
+                         [u"", u"é", u"é", u""])
+        self.assertEqual([m.span() for m in rure.finditer(u"\\b", u"éé é")],
+                         [(0, 0), (2, 2), (3, 3)])
+
     def test_nonmatching_captures(self):
         ptn = u"(re).*(ger)"
         email = u"tony@tiremove_thisger.net"
@@ -1,10 +1,15 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+import mmap
+import os
+import tempfile
 import unittest
+from array import array
 
 from rure.exceptions import CompiledTooBigError, RegexSyntaxError
-from rure.lib import CASEI, Rure
+from rure.lib import CAPTURE_TYPECODE, CASEI, OFFSET_TYPECODE
+from rure.lib import LineMatch, Rure, RureMatch
 
 
 class TestRure(unittest.TestCase):
@@ -93,6 +98,202 @@ class TestRure(unittest.TestCase):
                 expect_start, expect_end, match.start, match.end)
         )
 
+    def test_find_all(self):
+        haystack = b"abc xyz"
+        re = Rure(b"\\w+")
+        self.assertEqual(list(re.find_all(haystack)), [0, 3, 4, 7])
+        self.assertEqual(list(re.find_all(haystack, 1)), [1, 3, 4, 7])
+        self.assertEqual(len(re.find_all(b"   ")), 0)
+
+    def test_find_all_matches_find_iter(self):
+        haystack = b"a1bb2 ccc3" * 300
+        for pattern in (b"[a-z]*", b"\\d", b"\\b"):
+            re = Rure(pattern)
+            expected = [o for m in re.find_iter(haystack) for o in m]
+            self.assertEqual(list(re.find_all(haystack)), expected)
+
+    def test_find_all_limit(self):
+        re = Rure(b"a")
+        self.assertEqual(list(re.find_all(b"aaaa", limit=3)),
+                         [0, 1, 1, 2, 2, 3])
+        self.assertEqual(len(Rure(b"(a)").captures_all(b"a" * 3000,
+                                                       limit=2000)),
+                         2000 * 4)
+
+    def test_find_all_out(self):
+        re = Rure(b"\\w+")
+        out = array(OFFSET_TYPECODE, [0] * 4)
+        self.assertEqual(re.find_all(b"abc xyz", out=out), 2)
+        self.assertEqual(list(out), [0, 3, 4, 7])
+
+        out = array(OFFSET_TYPECODE, [0] * 2)
+        self.assertEqual(re.find_all(b"abc xyz", out=out), 1)
+        self.assertEqual(list(out), [0, 3])
+
+    def test_captures_all(self):
+        haystack = b"a1 b c3"
+        re = Rure(b"([a-z])(\\d)?")
+        self.assertEqual(list(re.captures_all(haystack)),
+                         [0, 2, 0, 1, 1, 2,
+                          3, 4, 3, 4, -1, -1,
+                          5, 7, 5, 6, 6, 7])
+        self.assertEqual(list(re.captures_all(haystack, 4)),
+                         [5, 7, 5, 6, 6, 7])
+
+    def test_captures_all_matches_captures_iter(self):
+        haystack = b"a1bb2 ccc3" * 300
+        re = Rure(b"([a-z]*)(\\d)?")
+        expected = [
+            o
+            for captures in re.captures_iter(haystack)
+            for group in captures
+            for o in (group if group else (-1, -1))
+        ]
+        self.assertEqual(list(re.captures_all(haystack)), expected)
+
+    def test_captures_all_out(self):
+        re = Rure(b"([a-z])(\\d)?")
+        out = array(CAPTURE_TYPECODE, [0] * 12)
+        self.assertEqual(re.captures_all(b"a1 b c3", out=out), 2)
+        self.assertEqual(list(out), [0, 2, 0, 1, 1, 2, 3, 4, 3, 4, -1, -1])
+
+    def test_search_window(self):
+        haystack = b"abc 123 xyz 456"
+        re = Rure(b"\\d+")
+        self.assertEqual(re.find(haystack, 0, 6), (4, 6))
+        self.assertIsNone(re.find(haystack, 0, 4))
+        self.assertFalse(re.is_match(haystack, 7, 12))
+        self.assertEqual(re.shortest_match(haystack, 0, 5), 5)
+        self.assertIn(re.shortest_match(haystack, 8), (13, 15))
+        self.assertEqual(re.captures(haystack, 8, 13)[0], (12, 13))
+        self.assertEqual(list(re.find_iter(haystack, 5, 13)),
+                         [(5, 7), (12, 13)])
+        self.assertEqual(list(re.find_all(haystack, 5, 13)), [5, 7, 12, 13])
+        self.assertEqual(list(Rure(b"\\d+$").find_iter(haystack, 0, 6)),
+                         [(4, 6)])
+
+    def test_search_window_keeps_context(self):
+        re = Rure(b"\\bxyz")
+        self.assertFalse(re.is_match(b"abcxyz", 3))
+        self.assertTrue(re.is_match(b"abc xyz", 4))
+
+    def test_end_anchored_with_start(self):
+        re = Rure(b"\\w+$")
+        self.assertTrue(re.is_match(b"abc xyz", 5))
+        self.assertTrue(re.is_match(b"abc xyz", 4, 6))
+        self.assertEqual(re.shortest_match(b"abc xyz", 5), 7)
+        self.assertEqual(re.is_match_many([b"abc xyz", b"abc "], 4),
+                         bytearray([1, 0]))
+
+    def test_iter_start(self):
+        haystack = b"abc xyz"
+        re = Rure(b"\\w+(\\w)")
+        self.assertEqual(list(re.find_iter(haystack, 4)), [(4, 7)])
+        captures = list(re.captures_iter(haystack, 1))
+        self.assertEqual([c[0] for c in captures], [(1, 3), (4, 7)])
+
+    def test_start_out_of_bounds(self):
+        re = Rure(b"a*")
+        for start in (4, 100):
+            self.assertFalse(re.is_match(b"abc", start))
+            self.assertIsNone(re.find(b"abc", start))
+            self.assertIsNone(re.captures(b"abc", start))
+            self.assertIsNone(re.shortest_match(b"abc", start))
+            self.assertEqual(list(re.find_iter(b"abc", start)), [])
+            self.assertEqual(re.is_match_many([b"abc"], start), bytearray(1))
+        self.assertEqual(list(re.find_iter(b"abc", 3)), [(3, 3)])
+
+    def test_count(self):
+        haystack = b"a1bb2 ccc3" * 300
+        for pattern in (b"[a-z]*", b"\\d", b"\\b", b"x"):
+            re = Rure(pattern)
+            self.assertEqual(re.count(haystack),
+                             len(list(re.find_iter(haystack))))
+        self.assertEqual(Rure(b"\\d").count(b"1 2 3 4", 1, 5), 2)
+
+    def test_is_match_many(self):
+        re = Rure(b"\\d+")
+        haystacks = [b"abc", b"a1c", b"", b"42"]
+        self.assertEqual(re.is_match_many(haystacks), bytearray([0, 1, 0, 1]))
+        self.assertEqual(re.is_match_many([]), bytearray())
+
+    def test_find_many(self):
+        re = Rure(b"\\d+")
+        haystacks = [b"abc", b"a1c", b"", b"42"]
+        self.assertEqual(list(re.find_many(haystacks)),
+                         [-1, -1, 1, 2, -1, -1, 0, 2])
+
+    def test_map_is_match(self):
+        re = Rure(b"\\d+")
+        haystacks = [b"abc", b"a1c", b"", b"42"] * 25
+        self.assertEqual(re.map_is_match(haystacks, workers=2, chunksize=7),
+                         re.is_match_many(haystacks))
+
+    def test_map_find(self):
+        re = Rure(b"\\d+")
+        haystacks = [b"abc", b"a1c", b"", b"42"] * 25
+        self.assertEqual(re.map_find(haystacks, workers=2, chunksize=7),
+                         re.find_many(haystacks))
+
+    def test_buffer_haystacks(self):
+        re = Rure(b"\\d+")
+        data = b"abc 123 xyz"
+        anonymous = mmap.mmap(-1, len(data))
+        anonymous.write(data)
+        for haystack in (bytearray(data), memoryview(data), anonymous,
+                         array('B', data)):
+            self.assertTrue(re.is_match(haystack))
+            self.assertEqual(re.find(haystack), (4, 7))
+            self.assertEqual(list(re.find_iter(haystack)), [(4, 7)])
+        self.assertEqual(re.find(memoryview(data)[4:]), (0, 3))
+        self.assertEqual(re.is_match_many([bytearray(data), b"abc"]),
+                         bytearray([1, 0]))
+
+    def test_buffer_haystack_type_check(self):
+        re = Rure(b"\\d+")
+        with self.assertRaises(TypeError):
+            re.is_match(u"123")
+        with self.assertRaises(TypeError):
+            re.is_match(memoryview(b"1 2 3")[::2])
+        with self.assertRaises(TypeError):
+            re.find_many([u"123"])
+
+    def test_buffer_haystack_not_resized_while_scanning(self):
+        re = Rure(b"\\d+")
+        haystack = bytearray(b"1 2 3")
+        matches = re.find_iter(haystack)
+        next(matches)
+        with self.assertRaises(BufferError):
+            haystack.extend(b" 4")
+        self.assertEqual(list(matches), [(2, 3), (4, 5)])
+
+    def _write_temp(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as fobj:
+            fobj.write(data)
+        return path
+
+    def test_search_file(self):
+        path = self._write_temp(b"foo\nbar 1\n\nbaz 22 333\n4")
+        re = Rure(b"\\d+")
+        self.assertEqual(list(re.search_file(path)), [
+            LineMatch(2, 4, 8, 9),
+            LineMatch(4, 11, 15, 17),
+            LineMatch(4, 11, 18, 21),
+            LineMatch(5, 22, 22, 23),
+        ])
+        self.assertEqual(list(re.search_file(path, mode='matches')), [
+            RureMatch(8, 9), RureMatch(15, 17),
+            RureMatch(18, 21), RureMatch(22, 23),
+        ])
+        with self.assertRaises(ValueError):
+            list(re.search_file(path, mode='bytes'))
+
+    def test_search_file_empty(self):
+        path = self._write_temp(b"")
+        self.assertEqual(list(Rure(b"").search_file(path)), [])
+
     def test_iter_capture_names(self):
         re = Rure(b"(?P<year>\\d{4})-(?P<month>\\d{2})-(?P<day>\\d{2})")
         cn_iter = re.capture_names()
@@ -107,6 +308,46 @@ class TestRure(unittest.TestCase):
                 )
             )
 
+    def test_sub(self):
+        re = Rure(b"(?P<user>\\w+)@(\\w+)")
+        haystack = b"a@b, c@d; e"
+        self.assertEqual(re.subn(b"[$2:${user}$$]", haystack),
+                         (b"[b:a$], [d:c$]; e", 2))
+        self.assertEqual(re.sub(b"-", haystack, count=1), b"-, c@d; e")
+        self.assertEqual(re.sub(b"$9$nope", bytearray(haystack)), b", ; e")
+        self.assertEqual(Rure(b"a*").sub(b"-", b"baac"), b"-b-c-")
+        # Large counts don't preallocate anything.
+        self.assertEqual(re.subn(b"$2", haystack, count=2 ** 62),
+                         (b"b, d; e", 2))
+        self.assertEqual(Rure(b"a").subn(b"b", b"a" * 3000, count=2500),
+                         (b"b" * 2500 + b"a" * 500, 2500))
+
+    def test_sub_callable(self):
+        re = Rure(b"(a)(x)?")
+        def repl(captures):
+            return b"x" if captures[2] else str(captures[1].start).encode()
+        self.assertEqual(re.subn(repl, b"banaxna"), (b"b1nxn6", 3))
+        self.assertEqual(re.sub(repl, b"banaxna", count=2), b"b1nxna")
+
+    def test_split(self):
+        re = Rure(b",\\s*")
+        self.assertEqual(re.split(b"a, b,,c"), [b"a", b"b", b"", b"c"])
+        self.assertEqual(re.split(b"a, b,,c", maxsplit=1), [b"a", b"b,,c"])
+        self.assertEqual(re.split(bytearray(b"a,b")), [b"a", b"b"])
+        self.assertEqual(re.split(b""), [b""])
+        self.assertEqual(re.split(b"a,b", maxsplit=2 ** 62), [b"a", b"b"])
+
+    def test_split_iter(self):
+        re = Rure(b"\\s+")
+        haystack = bytearray(b"ab  c d")
+        pieces = list(re.split_iter(haystack))
+        self.assertTrue(all(isinstance(p, memoryview) for p in pieces))
+        self.assertEqual([bytes(p) for p in pieces], re.split(bytes(haystack)))
+        haystack[0:1] = b"x"
+        self.assertEqual(bytes(pieces[0]), b"xb")
+        self.assertEqual([bytes(p) for p in re.split_iter(b"a b c", 1)],
+                         [b"a", b"b c"])
+
     def test_flags(self):
         """Test whether we can set the flags correctly.
 
@@ -131,3 +372,29 @@ class TestRure(unittest.TestCase):
             Rure(b"\\w{100}", size_limit=0)
         except CompiledTooBigError as err:
             self.assertIn("exceeds size", err.message)
+
+    def test_info(self):
+        info = Rure(b"Sherlock|Holmes").info()
+        self.assertEqual(info.prefixes, (b"Holmes", b"Sherlock"))
+        self.assertEqual(info.engine, "literal")
+        self.assertEqual(info.captures, 1)
+
+        info = Rure(b"(?P<word>\\w+)ing$").info()
+        self.assertEqual(info.captures, 2)
+        self.assertEqual(info.suffixes, (b"ing",))
+        self.assertEqual((info.anchored_start, info.anchored_end),
+                         (False, True))
+        self.assertEqual(info.engine, "dfa_anchored_reverse")
+        self.assertEqual(Rure(b"\\w+ing").info().engine, "dfa_suffix")
+        self.assertTrue(Rure(b"\\bfoo\\b").info().nfa_on_non_ascii)
+        self.assertEqual(Rure(b"[a-z]+", dfa_size_limit=0).info().engine,
+                         "nfa")
+
+    def test_info_program_size(self):
+        info = Rure(b"\\w+a").info()
+        self.assertGreater(info.instructions, 0)
+        Rure(b"\\w+a", size_limit=info.program_size)
+        with self.assertRaises(CompiledTooBigError):
+            Rure(b"\\w+a", size_limit=info.program_size // 2)
+        self.assertGreater(info.program_size,
+                           Rure(b"[a-z]+").info().program_size)
@@ -4,7 +4,7 @@ from __future__ import print_function
 import unittest
 
 from rure.exceptions import CompiledTooBigError, RegexSyntaxError
-from rure.lib import CASEI, RureSet
+from rure.lib import CASEI, RureMatch, RureSet, SetMatch
 
 
 class TestRureSet(unittest.TestCase):
@@ -23,6 +23,123 @@ class TestRureSet(unittest.TestCase):
         res = RureSet(b"baz", b"bar", b"foo")
         self.assertEqual(res.matches(haystack), [False, True, True])
 
+    def test_is_match_many(self):
+        res = RureSet(b"baz", b"bar")
+        haystacks = [b"foobar", b"foo", b"bazaar"]
+        self.assertEqual(res.is_match_many(haystacks), bytearray([1, 0, 1]))
+
+    def test_matches_many(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        haystacks = [b"foobar", b"qux", b"baz"]
+        self.assertEqual(res.matches_many(haystacks),
+                         bytearray([0, 1, 1,
+                                    0, 0, 0,
+                                    1, 0, 0]))
+
+    def test_map_matches(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        haystacks = [b"foobar", b"qux", b"baz"] * 25
+        self.assertEqual(res.map_matches(haystacks, workers=2, chunksize=7),
+                         res.matches_many(haystacks))
+        self.assertEqual(res.map_is_match(haystacks, workers=2, chunksize=7),
+                         res.is_match_many(haystacks))
+
+    def test_buffer_haystacks(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        for haystack in (bytearray(b"foobar"), memoryview(b"foobar")):
+            self.assertTrue(res.is_match(haystack))
+            self.assertEqual(res.matches(haystack), [False, True, True])
+
+    def test_search_window(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        self.assertEqual(res.matches(b"foobar", 0, 5), [False, False, True])
+        self.assertEqual(res.matches(b"foobar", 3), [False, True, False])
+        self.assertFalse(res.is_match(b"foobar", 1, 5))
+        self.assertFalse(res.is_match(b"foobar", 10))
+
+    def test_end_anchored_with_start(self):
+        res = RureSet(b"\\w+$")
+        self.assertTrue(res.is_match(b"abc xyz", 5))
+        self.assertEqual(res.is_match_many([b"abc xyz", b"abc "], 4),
+                         bytearray([1, 0]))
+
+    def test_count_per_pattern(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        self.assertEqual(list(res.count_per_pattern(b"foobar")), [0, 1, 1])
+        self.assertEqual(list(res.count_per_pattern(bytearray(b"baz"))),
+                         [1, 0, 0])
+        haystacks = [b"foobar", b"qux", b"bazbar", b"foo"]
+        self.assertEqual(list(res.count_per_pattern(haystacks)), [1, 2, 2])
+
+    def test_matches_sparse(self):
+        res = RureSet(b"baz", b"bar", b"foo")
+        haystacks = [b"foobar", b"qux", bytearray(b"bazbar"), b"foo"]
+        indptr, indices = res.matches_sparse(iter(haystacks))
+        self.assertEqual(list(indptr), [0, 2, 2, 4, 5])
+        self.assertEqual(list(indices), [1, 2, 0, 1, 2])
+        self.assertEqual(res.map_matches_sparse(haystacks, workers=2,
+                                                chunksize=1),
+                         (indptr, indices))
+
+    def test_find_matches(self):
+        res = RureSet(b"\\d+", b"[a-z]+", b"zzz")
+        self.assertEqual(res.find_matches(bytearray(b"ab 12 c3")), [
+            SetMatch(1, 0, 2), SetMatch(0, 3, 5),
+            SetMatch(1, 6, 7), SetMatch(0, 7, 8),
+        ])
+        self.assertEqual(res.find_matches(b"ab 12 c3", 3, 7),
+                         [SetMatch(0, 3, 5), SetMatch(1, 6, 7)])
+        self.assertEqual(res.find_matches(b"!"), [])
+        self.assertIsNone(res._res[2])
+
+    def test_captures_matches(self):
+        res = RureSet(b"(?P<n>\\d+)", b"([a-z])+", flags=CASEI)
+        matches = res.captures_matches(b"AB 12")
+        self.assertEqual([match[:3] for match in matches],
+                         [(1, 0, 2), (0, 3, 5)])
+        self.assertEqual(matches[0].captures[1], RureMatch(1, 2))
+        self.assertEqual(matches[1].captures.n, RureMatch(3, 5))
+
+    def test_sharding(self):
+        patterns = [b"a%d[a-z]{20}" % i for i in range(16)]
+        haystack = b"a15bcdefghijklmnopqrstu a3bcdefghijklmnopqrstu"
+        expected = RureSet(*patterns).matches(haystack)
+        for options in ({"size_limit": 2000}, {"shard_size": 5}):
+            res = RureSet(*patterns, **options)
+            self.assertGreater(len(res._shards), 1)
+            self.assertEqual(len(res), 16)
+            self.assertEqual(res.matches(haystack), expected)
+            self.assertEqual(res.matches(b"x" * (1 << 16) + haystack),
+                             expected)
+            self.assertEqual(res.find_matches(haystack),
+                             [SetMatch(15, 0, 23), SetMatch(3, 24, 46)])
+            self.assertEqual(list(res.matches_sparse([b"", haystack])[1]),
+                             [3, 15])
+        self.assertRaises(CompiledTooBigError, RureSet, *patterns,
+                          size_limit=100)
+
+    def test_update(self):
+        res = RureSet(b"foo", b"bar", b"baz", shard_size=2)
+        shards = list(res._shards)
+        res[-1] = b"qux"
+        self.assertEqual(res._shards[0], shards[0])
+        res.extend([b"quux", b"corge"])
+        res.append(b"grault")
+        self.assertEqual(res._shards[0], shards[0])
+        self.assertEqual([shard.size for shard in res._shards], [2, 2, 2])
+        self.assertEqual(res.patterns, [b"foo", b"bar", b"qux", b"quux",
+                                        b"corge", b"grault"])
+        self.assertEqual(res.matches(b"baz qux grault"),
+                         [False, False, True, False, False, True])
+        self.assertRaises(TypeError, res.append, u"foo")
+
+        # Without shard_size, appended regexes go into the last shard.
+        res = RureSet(b"foo")
+        for i in range(10):
+            res.append(b"bar%d" % i)
+        self.assertEqual(len(res._shards), 1)
+        self.assertEqual(res.matches(b"bar9")[-1], True)
+
     def test_set_len(self):
         res = RureSet(b"baz", b"bar", b"foo")
         self.assertEqual(len(res), 3)
@@ -51,3 +168,15 @@ class TestRureSet(unittest.TestCase):
             RureSet(b"\\w{100}", size_limit=0)
         except CompiledTooBigError as err:
             self.assertIn("exceeds size", err.message.lower())
+
+    def test_info(self):
+        info = RureSet(b"foo", b"bar").info()
+        self.assertEqual(info.prefixes, (b"bar", b"foo"))
+        self.assertIsNone(info.captures)
+        self.assertEqual(info.engine, "dfa_many")
+        self.assertEqual(RureSet(b"foo", b"^bar").info().prefixes, ())
+
+        sharded = RureSet(b"foo", b"\\w", b"bar", shard_size=1).info()
+        self.assertEqual(sharded.program_size,
+                         sum(RureSet(re).info().program_size
+                             for re in (b"foo", b"\\w", b"bar")))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import io
+import unittest
+
+from rure.lib import Rure, RureMatch
+from rure.stream import StreamMatcher
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestStreamMatcher(unittest.TestCase):
+
+    def assertStreamMatches(self, pattern, data, max_match_len):
+        re = Rure(pattern)
+        expected = list(re.find_iter(data))
+        for size in (1, 2, 3, 7, 64, len(data) or 1):
+            matcher = StreamMatcher(re, max_match_len)
+            self.assertEqual(list(matcher.find_iter(chunked(data, size))),
+                             expected,
+                             "chunk size {}".format(size))
+
+    def test_bounded_pattern(self):
+        data = b"id=12 x id=345, id=6 \xE2\x98\x83 id=7890" * 20
+        self.assertStreamMatches(b"\\bid=\\d{1,4}\\b", data, 8)
+
+    def test_empty_matches(self):
+        self.assertStreamMatches(b"\\b", b"ab cd  ef", 1)
+        self.assertStreamMatches(b"x*", b"axxbxc", 2)
+
+    def test_anchors(self):
+        self.assertStreamMatches(b"(?m)^\\w+", b"ab\ncd\n\nef gh", 3)
+        self.assertStreamMatches(b"\\Aab", b"abababab", 2)
+
+    def test_leftmost_first_needs_lookahead(self):
+        # On "abbb" alone the leftmost-first match is "a"; the resolved
+        # match must wait until the longer alternative can be ruled out.
+        self.assertStreamMatches(b"ab+c|a", b"abbbc abbbd", 5)
+
+    def test_absolute_offsets(self):
+        matcher = StreamMatcher(Rure(b"\\d+"), 4)
+        matches = matcher.feed(b"ab 12")
+        matches += matcher.feed(b" cd 3456 ")
+        matches += matcher.close()
+        self.assertEqual(matches, [RureMatch(3, 5), RureMatch(9, 13)])
+
+    def test_file_like(self):
+        data = b"alpha beta\ngamma delta\n" * 100
+        re = Rure(b"\\w+a\\b")
+        matcher = StreamMatcher(re, 16)
+        self.assertEqual(
+            list(matcher.find_iter(io.BytesIO(data), chunk_size=5)),
+            list(re.find_iter(data)))
+
+    def test_unbounded_pattern_is_windowed(self):
+        matcher = StreamMatcher(Rure(b"a+"), 3)
+        matches = list(matcher.find_iter(chunked(b"aaaaaa", 1)))
+        self.assertEqual(matches, [RureMatch(0, 3), RureMatch(3, 6)])
+
+    def test_tail_is_bounded(self):
+        matcher = StreamMatcher(Rure(b"\\d{3}"), 3)
+        for chunk in chunked(b"x" * 10000, 100):
+            matcher.feed(chunk)
+            self.assertLessEqual(len(matcher._buf), 100 + 3 + 4)
+
+    def test_long_matches_are_cut_at_window(self):
+        expected = [RureMatch(i, i + 4) for i in range(0, 20, 4)]
+        for size in (1, 3, 10, 20):
+            matcher = StreamMatcher(Rure(b"a+"), 4)
+            self.assertEqual(
+                list(matcher.find_iter(chunked(b"a" * 20, size))), expected,
+                "chunk size {}".format(size))
+
+    def test_long_matches_do_not_depend_on_chunks(self):
+        data = b"a" + b"x" * 10 + b"b ab"
+        for chunks in ([data], chunked(data, 1), [data[:6], data[6:]]):
+            matcher = StreamMatcher(Rure(b"a.*b"), 4)
+            self.assertEqual(list(matcher.find_iter(chunks)),
+                             [RureMatch(13, 15)])
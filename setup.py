@@ -40,7 +40,8 @@ setup(
     keywords=['regex', 'rust', 'dfa', 'automata', 'data_structures'],
     url='https://github.com/davidblewett/rure-python',
     setup_requires=['milksnake'],
-    install_requires=['milksnake', 'cffi>=1.5.0', 'six'],
+    install_requires=['milksnake', 'cffi>=1.12.0', 'six',
+                      'futures; python_version < "3"'],
     milksnake_tasks=[
         build_native
     ],